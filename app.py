@@ -1,37 +1,159 @@
-from flask import Flask, render_template_string, request, jsonify, make_response
+from flask import (Flask, Response, g, has_request_context, render_template_string, request, jsonify,
+                   make_response, stream_with_context)
 import requests
 import random
 import string
+import atexit
+import cProfile
+import glob
+import gzip
+import hashlib
+import hmac
+import itertools
+import json
 import logging
+import math
+import mmap
 import os
+import queue
 import re
+import secrets
+import shutil
+import socket
+import struct
+import tempfile
+import threading
 import time
-from collections import defaultdict
-from logging.handlers import RotatingFileHandler
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, suppress
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from requests.adapters import HTTPAdapter
+from typing import NamedTuple
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: threads are still serialised
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # optional: the page is then offered gzipped or plain
+    brotli = None
 
 app = Flask(__name__)
 
 # ── Logging setup ─────────────────────────────────────────────────────────────
 
-LOG_DIR  = os.environ.get('LOG_DIR', 'logs')
-LOG_FILE = os.path.join(LOG_DIR, 'security.log')
+# Request threads only put records on a bounded queue; one writer thread per
+# process formats them and writes this worker's own file (so rotation never
+# races another worker) and the console. A full queue drops the record and
+# counts it rather than making the request wait. INFO events can be sampled:
+# LOG_INFO_SAMPLE applies to all of them, LOG_SAMPLE="EVENT=rate,..." per event.
+# A worker's file is named after the lowest free slot rather than its pid, so
+# a restarted worker takes over the file (and rotations) of the one it
+# replaces instead of starting another set.
+
+LOG_DIR         = os.environ.get('LOG_DIR', 'logs')
+LOG_FORMAT      = os.environ.get('LOG_FORMAT', 'text')   # 'text' or 'json' (one object per line)
+LOG_PER_WORKER  = os.environ.get('LOG_PER_WORKER', '1').lower() not in ('0', 'false', 'no')
+LOG_QUEUE_SIZE  = int(os.environ.get('LOG_QUEUE_SIZE', 10_000))
+LOG_INFO_SAMPLE = float(os.environ.get('LOG_INFO_SAMPLE', 1))
+LOG_SAMPLE      = {event.strip(): float(rate) for event, _, rate in
+                   (pair.partition('=') for pair in os.environ.get('LOG_SAMPLE', '').split(',') if pair)}
 os.makedirs(LOG_DIR, exist_ok=True)
 
-_fmt = logging.Formatter(
+
+def _log_slot() -> str:
+    """Claim the lowest slot no live process holds; the lock dies with us."""
+    if fcntl is None:   # no locks to coordinate with: fall back to the pid
+        return str(os.getpid())
+    global _log_slot_fd
+    for n in itertools.count():
+        fd = os.open(os.path.join(LOG_DIR, f'.security-{n}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # lockf, not flock: a forked child must not inherit its parent's slot
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        _log_slot_fd = fd   # held open for the life of the process
+        return str(n)
+
+
+LOG_FILE = os.path.join(LOG_DIR, f'security-{_log_slot()}.log' if LOG_PER_WORKER else 'security.log')
+
+
+class _JsonFormatter(logging.Formatter):
+    """``EVENT  key=value  key=value`` messages as compact JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        head, *parts = record.getMessage().split('  ')
+        entry = {'ts':     time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                           + f'.{int(record.msecs):03d}Z',
+                 'level':  record.levelname,
+                 'logger': record.name,
+                 'event':  head}
+        key = None
+        for part in parts:
+            k, eq, v = part.partition('=')
+            if eq and k.isidentifier():
+                key, entry[k] = k, int(v) if v.isdigit() else v
+            elif key:   # a value that itself contained two spaces
+                entry[key] = f'{entry[key]}  {part}'
+        return json.dumps(entry, separators=(',', ':'))
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count('log_dropped')
+
+
+class _LogWriter(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        with suppress(queue.Full):   # wait for room: stopping must not drop the tail
+            self.queue.put(self._sentinel, timeout=5)
+
+
+def _sample(record: logging.LogRecord) -> bool:
+    if record.levelno > logging.INFO:
+        return True
+    rate = LOG_SAMPLE.get(str(record.msg).split('  ', 1)[0], LOG_INFO_SAMPLE)
+    if rate >= 1 or random.random() < rate:
+        return True
+    _count('log_sampled_out')
+    return False
+
+
+_fmt = _JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(
     '%(asctime)s  %(levelname)-8s  %(name)s  %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S',
 )
 
-security_logger = logging.getLogger('security')
-security_logger.setLevel(logging.INFO)
-
 _file_handler = RotatingFileHandler(LOG_FILE, maxBytes=2_000_000, backupCount=5)
 _file_handler.setFormatter(_fmt)
-security_logger.addHandler(_file_handler)
 
 _console_handler = logging.StreamHandler()
 _console_handler.setFormatter(_fmt)
-security_logger.addHandler(_console_handler)
+
+_log_queue   = queue.Queue(LOG_QUEUE_SIZE)
+_log_handler = _DroppingQueueHandler(_log_queue)
+_log_handler.addFilter(_sample)
+_log_writer  = _LogWriter(_log_queue, _file_handler, _console_handler)
+_log_writer.start()
+atexit.register(_log_writer.stop)   # drain what is queued on shutdown
+
+security_logger = logging.getLogger('security')
+security_logger.setLevel(logging.INFO)
+security_logger.addHandler(_log_handler)
+security_logger.propagate = False   # the writer already prints to the console
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s  %(levelname)-8s  %(message)s',
                     datefmt='%Y-%m-%d %H:%M:%S')
@@ -59,77 +181,965 @@ def add_security_headers(response):
     return response
 
 
+# ── Serving mode ──────────────────────────────────────────────────────────────
+
+# Under gunicorn's gevent worker (see render.yaml) the stdlib is patched before
+# this module is imported: each request is a greenlet on the worker's event
+# loop, and the blocking calls in `requests`, time.sleep, locks and futures
+# yield to it, so a request waiting on ipapi.is or Roblox costs a coroutine
+# rather than a thread. CPU-bound generation would stall the loop, so it is
+# handed to a native thread with _offload.
+try:
+    from gevent import get_hub as _get_hub, monkey as _monkey
+    ASYNC_MODE = _monkey.is_module_patched('socket')
+except ImportError:
+    ASYNC_MODE = False
+
+
+def _native(module: str, name: str, default):
+    """The unpatched stdlib `module.name` in async mode, else `default`."""
+    return _monkey.get_original(module, name) if ASYNC_MODE else default
+
+
+def _offload(fn, *args):
+    """Call `fn(*args)`, off the event loop on a native thread in async mode."""
+    if ASYNC_MODE:
+        return _get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+# ── Shared state ──────────────────────────────────────────────────────────────
+
+# Tables live in a memory-mapped file so every gunicorn worker on the host
+# sees the same data. /dev/shm keeps them off the disk where it exists.
+SHARED_STATE_DIR = os.environ.get(
+    'SHARED_STATE_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+
+def _every(interval: float, fn) -> threading.Thread:
+    """Run `fn` every `interval` seconds on a daemon thread."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                fn()
+            except Exception:  # keep the thread alive whatever happens
+                app.logger.exception('Background task %s failed', fn.__name__)
+    t = threading.Thread(target=loop, name=f'every-{fn.__name__}', daemon=True)
+    t.start()
+    return t
+
+
+class SharedTable:
+    """Fixed-size hash table of fixed-size records in a shared mmap file.
+
+    Keys hash to a bucket of `WAYS` slots and a full bucket overwrites its
+    least recently touched slot, so memory stays at `slots` records no
+    matter how many keys are seen. Each bucket is guarded by a striped
+    threading lock (threads of this worker) plus an fcntl byte-range lock
+    (other workers). Values are tuples packed with the `value_fmt` struct
+    format.
+    """
+
+    WAYS    = 8
+    STRIPES = 256
+    _head   = struct.Struct('<Qd')   # key hash (0 = empty), last touched
+
+    def __init__(self, name: str, slots: int, value_fmt: str):
+        self._value   = struct.Struct('<' + value_fmt)
+        self._rec     = struct.Struct('<Qd' + value_fmt)
+        self._empty   = bytes(self._rec.size)
+        self._buckets = max(1, slots // self.WAYS)
+        self._span    = self.WAYS * self._rec.size
+        self._locks   = [threading.Lock() for _ in range(self.STRIPES)]
+
+        nbytes = self._buckets * self._span
+        path   = os.path.join(SHARED_STATE_DIR,
+                              f'spacegen-{name}-{self._rec.size}x{self._buckets * self.WAYS}.bin')
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < nbytes:
+            os.ftruncate(self._fd, nbytes)
+        self._mm = mmap.mmap(self._fd, nbytes)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    @contextmanager
+    def _locked(self, bucket: int):
+        stripe = bucket % self.STRIPES
+        with self._locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def update(self, key: str, fn):
+        """Atomically replace the value for `key` and return a result.
+
+        `fn` gets the stored value (None when absent) and returns a
+        ``(new_value, result)`` pair; a `new_value` of None deletes the key.
+        """
+        h      = self._hash(key)
+        bucket = h % self._buckets
+        start  = bucket * self._span
+        mm     = self._mm
+        with self._locked(bucket):
+            slot, victim, oldest = None, start, float('inf')
+            for off in range(start, start + self._span, self._rec.size):
+                kh, touched = self._head.unpack_from(mm, off)
+                if kh == h:
+                    slot = off
+                    break
+                if touched < oldest:
+                    victim, oldest = off, touched
+            old = None if slot is None else self._value.unpack_from(mm, slot + self._head.size)
+            new, result = fn(old)
+            if new is not None:
+                self._rec.pack_into(mm, victim if slot is None else slot, h, time.time(), *new)
+            elif slot is not None:
+                mm[slot:slot + self._rec.size] = self._empty
+        return result
+
+    def get(self, key: str) -> tuple | None:
+        """Return the value for `key` (marking it recently used) or None."""
+        return self.update(key, lambda old: (old, old))
+
+    def put(self, key: str, value: tuple) -> None:
+        self.update(key, lambda old: (value, None))
+
+    def delete(self, key: str) -> None:
+        self.update(key, lambda old: (None, None))
+
+    def sweep(self, is_stale) -> int:
+        """Drop every record for which ``is_stale(value, touched)`` is true."""
+        dropped, mm, size = 0, self._mm, self._rec.size
+        for stripe in range(min(self.STRIPES, self._buckets)):
+            with self._locked(stripe):
+                for bucket in range(stripe, self._buckets, self.STRIPES):
+                    start = bucket * self._span
+                    for off in range(start, start + self._span, size):
+                        kh, touched = self._head.unpack_from(mm, off)
+                        if kh and is_stale(self._value.unpack_from(mm, off + self._head.size), touched):
+                            mm[off:off + size] = self._empty
+                            dropped += 1
+        return dropped
+
+    def __len__(self) -> int:
+        mm, size = self._mm, self._rec.size
+        return sum(1 for off in range(0, len(mm), size) if self._head.unpack_from(mm, off)[0])
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into a single call.
+
+    The first caller runs `fn`; callers arriving while it is in flight block
+    on the same future and share its result (or exception). `claim` and
+    `settle` do the same for callers that resolve many keys in one go.
+    """
+
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._calls: dict[str, Future] = {}
+
+    def claim(self, keys) -> tuple[dict[str, Future], dict[str, Future]]:
+        """Split `keys` into ones this caller must settle and ones in flight."""
+        mine, theirs = {}, {}
+        with self._lock:
+            for key in keys:
+                fut = self._calls.get(key)
+                if fut is None:
+                    mine[key] = self._calls[key] = Future()
+                else:
+                    theirs[key] = fut
+        return mine, theirs
+
+    def settle(self, key: str, result=None, exc: BaseException | None = None) -> None:
+        with self._lock:
+            fut = self._calls.pop(key)
+        if exc is None:
+            fut.set_result(result)
+        else:
+            fut.set_exception(exc)
+
+    def do(self, key: str, fn) -> tuple[object, bool]:
+        """Return ``(result, shared)``; `shared` is True for followers."""
+        mine, theirs = self.claim([key])
+        if theirs:
+            return theirs[key].result(), True
+        try:
+            result = fn()
+        except BaseException as exc:
+            self.settle(key, exc=exc)
+            raise
+        self.settle(key, result)
+        return result, False
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+
+# Counters and fixed-bucket histograms are kept in plain dicts in each
+# worker, so recording one costs a dict update. Each worker flushes a
+# snapshot to SHARED_STATE_DIR every METRICS_FLUSH seconds and readers
+# (/metrics, /health) sum the snapshots of all live workers.
+
+METRICS_ENABLED = os.environ.get('METRICS', '1').lower() not in ('0', 'false', 'no')
+METRICS_FLUSH   = 2
+METRICS_TOKEN   = os.environ.get('METRICS_TOKEN', '')   # require "Bearer <token>" when set
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS   = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Each thread records into its own shard, so the hot path takes no lock;
+# snapshots merge the shards. In async mode a shard belongs to a native
+# thread (the event loop is one), not to each short-lived greenlet.
+_metrics_lock = _native('threading', 'Lock', threading.Lock)()
+_metrics_local = _native('threading', 'local', threading.local)()
+_shards: list[tuple[dict, dict]] = []   # per thread: ((name, labels) -> value, -> histogram)
+_METRICS_GLOB = os.path.join(SHARED_STATE_DIR, 'spacegen-metrics-*.json')
+
+
+def _shard() -> tuple[dict, dict]:
+    try:
+        return _metrics_local.shard
+    except AttributeError:
+        shard = _metrics_local.shard = ({}, {})
+        with _metrics_lock:
+            _shards.append(shard)
+        return shard
+
+
+def _count(name: str, n: float = 1, **labels) -> None:
+    if n and METRICS_ENABLED:
+        try:
+            counts = _metrics_local.shard[0]
+        except AttributeError:
+            counts = _shard()[0]
+        key = (name, tuple(labels.items()))   # callers pass labels in a fixed order
+        counts[key] = counts.get(key, 0) + n
+
+
+def _record(key: tuple, value: float, buckets: tuple) -> None:
+    try:
+        hists = _metrics_local.shard[1]
+    except AttributeError:
+        hists = _shard()[1]
+    h = hists.get(key)
+    if h is None:
+        h = hists[key] = [buckets, [0] * (len(buckets) + 1), 0.0]
+    h[1][bisect_left(buckets, value)] += 1
+    h[2] += value
+
+
+def _observe(name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+    if METRICS_ENABLED:
+        _record((name, tuple(labels.items())), value, buckets)
+
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1').lower() not in ('0', 'false', 'no')
+
+
+class _timed:
+    """Context manager recording the wall time of a request stage.
+
+    Within a request the time is also added to g.timings, which becomes the
+    response's Server-Timing header.
+    """
+
+    __slots__ = ('stage', 'key', 't0')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.key   = ('stage_seconds', (('stage', stage),))
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        if METRICS_ENABLED:
+            _record(self.key, elapsed, LATENCY_BUCKETS)
+        if SERVER_TIMING and has_request_context():
+            timings = g.setdefault('timings', {})
+            timings[self.stage] = timings.get(self.stage, 0) + elapsed
+
+
+def _flush_metrics() -> None:
+    counts: dict[tuple, float] = {}
+    hists:  dict[tuple, list]  = {}
+    with _metrics_lock:
+        shards = list(_shards)
+    for shard_counts, shard_hists in shards:
+        for key, v in shard_counts.copy().items():
+            counts[key] = counts.get(key, 0) + v
+        for key, (buckets, bucket_counts, total) in shard_hists.copy().items():
+            h = hists.setdefault(key, [buckets, [0] * len(bucket_counts), 0.0])
+            h[1] = [a + b for a, b in zip(h[1], bucket_counts)]
+            h[2] += total
+    snap = {
+        'counters':   [[name, labels, v] for (name, labels), v in counts.items()],
+        'histograms': [[name, labels, list(b), c, t] for (name, labels), (b, c, t) in hists.items()],
+    }
+    # The flush thread and _aggregate() can both get here at once: each
+    # writes its own temp file, so neither renames the other's away.
+    path     = os.path.join(SHARED_STATE_DIR, f'spacegen-metrics-{os.getpid()}.json')
+    fd, tmp  = tempfile.mkstemp(prefix=f'spacegen-metrics-{os.getpid()}.', suffix='.tmp',
+                                dir=SHARED_STATE_DIR)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snap, f)
+        os.replace(tmp, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_aggregate_cache: list = [0.0, None]
+
+
+def _aggregate() -> tuple[dict, dict]:
+    """Sum every live worker's snapshot; cached for a second."""
+    if _aggregate_cache[1] is not None and time.monotonic() - _aggregate_cache[0] < 1:
+        return _aggregate_cache[1]
+    try:
+        _flush_metrics()
+    except OSError:   # serve the snapshots already on disk rather than fail /health
+        app.logger.exception('Metrics flush failed')
+    counts: dict[tuple, float] = {}
+    hists:  dict[tuple, list]  = {}
+    for path in glob.glob(_METRICS_GLOB):
+        pid = int(path.rsplit('-', 1)[1].split('.')[0])
+        if not _pid_alive(pid):
+            with suppress(OSError):
+                os.remove(path)
+            continue
+        try:
+            with open(path, encoding='utf-8') as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, v in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counts[key] = counts.get(key, 0) + v
+        for name, labels, buckets, bucket_counts, total in snap['histograms']:
+            h = hists.setdefault((name, tuple(map(tuple, labels))), [buckets, [0] * len(bucket_counts), 0.0])
+            h[1] = [a + b for a, b in zip(h[1], bucket_counts)]
+            h[2] += total
+    _aggregate_cache[:] = [time.monotonic(), (counts, hists)]
+    return counts, hists
+
+
+def _counter(name: str) -> float:
+    """Host-wide value of an unlabelled counter."""
+    return _aggregate()[0].get((name, ()), 0)
+
+
+def _prometheus_text() -> str:
+    def fmt(labels, extra=()):
+        pairs = [*labels, *extra]
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    counts, hists = _aggregate()
+    lines, typed = [], set()
+    for (name, labels), v in sorted(counts.items()):
+        metric = f'spacegen_{name}_total'
+        if metric not in typed:
+            lines.append(f'# TYPE {metric} counter')
+            typed.add(metric)
+        lines.append(f'{metric}{fmt(labels)} {v:g}')
+    for (name, labels), (buckets, bucket_counts, total) in sorted(hists.items()):
+        metric = f'spacegen_{name}'
+        if metric not in typed:
+            lines.append(f'# TYPE {metric} histogram')
+            typed.add(metric)
+        cumulative = 0
+        for le, n in zip([*buckets, '+Inf'], bucket_counts):
+            cumulative += n
+            lines.append(f'{metric}_bucket{fmt(labels, [("le", le)])} {cumulative}')
+        lines.append(f'{metric}_sum{fmt(labels)} {total:g}')
+        lines.append(f'{metric}_count{fmt(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+if METRICS_ENABLED:
+    _every(METRICS_FLUSH, _flush_metrics)
+
+
+# ── Circuit breakers ──────────────────────────────────────────────────────────
+
+# One breaker per upstream per worker. Each call's outcome and latency go into
+# a rolling window. When enough calls in it fail the breaker opens and callers
+# take their fail-open path at once instead of waiting out a timeout; after a
+# cooldown a single probe is let through (half-open), which closes it again or
+# re-opens it for twice as long. The timeout of each call follows the
+# window's p99 of successful calls, clamped to [BREAKER_MIN_TIMEOUT, the
+# upstream's configured timeout]; probes always get the full timeout.
+
+BREAKER_WINDOW       = 30     # seconds of outcomes considered
+BREAKER_MIN_CALLS    = 10     # fewer than this in the window never opens it
+BREAKER_ERROR_RATE   = 0.5
+BREAKER_COOLDOWN     = 5      # seconds open before the first probe
+BREAKER_MAX_COOLDOWN = 60
+BREAKER_TIMEOUT_P99  = 2      # timeout = p99 x this
+BREAKER_MIN_TIMEOUT  = 1.0
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, max_timeout: float):
+        self.name        = name
+        self.max_timeout = max_timeout
+        self.cooldown    = BREAKER_COOLDOWN
+        self.state       = self.CLOSED
+        self._lock       = threading.Lock()
+        self._calls: deque = deque(maxlen=512)   # (finished_at, seconds, ok)
+        self._opened_at  = 0.0
+        self._timeout    = (0.0, max_timeout)    # (computed_at, value)
+
+    def allow(self) -> bool:
+        """True if a call may go out now; False means fail open immediately."""
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._move(self.HALF_OPEN)
+                return True   # this caller is the probe
+        _count('breaker_rejected', upstream=self.name)
+        return False
+
+    def timeout(self) -> float:
+        if self.state != self.CLOSED:
+            return self.max_timeout
+        now = time.monotonic()
+        at, value = self._timeout
+        if now - at >= 1:
+            with self._lock:
+                ok = sorted(sec for t, sec, good in self._calls if good and now - t < BREAKER_WINDOW)
+            value = self.max_timeout
+            if len(ok) >= BREAKER_MIN_CALLS:
+                p99   = ok[min(len(ok) - 1, int(len(ok) * 0.99))]
+                value = max(BREAKER_MIN_TIMEOUT, min(self.max_timeout, p99 * BREAKER_TIMEOUT_P99))
+            self._timeout = (now, value)
+        return value
+
+    def record(self, seconds: float, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._calls.append((now, seconds, ok))
+            if self.state == self.HALF_OPEN:
+                if ok:
+                    self.cooldown = BREAKER_COOLDOWN
+                    self._move(self.CLOSED)
+                else:
+                    self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+                    self._move(self.OPEN)
+            elif self.state == self.CLOSED and not ok:
+                recent = [good for t, _, good in self._calls if now - t < BREAKER_WINDOW]
+                if (len(recent) >= BREAKER_MIN_CALLS
+                        and recent.count(False) / len(recent) >= BREAKER_ERROR_RATE):
+                    self._move(self.OPEN)
+
+    def _move(self, state: str) -> None:
+        """Change state; the caller holds the lock."""
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        if state == self.CLOSED:
+            self._calls.clear()   # judge the recovered upstream on fresh outcomes
+        self.state = state
+        _count('breaker_transitions', upstream=self.name, to=state)
+        security_logger.warning('BREAKER  upstream=%s  state=%s  cooldown=%g', self.name, state, self.cooldown)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            recent = [good for t, _, good in self._calls if now - t < BREAKER_WINDOW]
+        return {
+            'state':      self.state,
+            'calls':      len(recent),
+            'error_rate': round(recent.count(False) / len(recent), 3) if recent else 0.0,
+            'timeout_s':  round(self.timeout(), 3),
+            'open_for_s': round(now - self._opened_at, 1) if self.state == self.OPEN else 0,
+        }
+
+
 # ── Rate limiting ─────────────────────────────────────────────────────────────
 
-_rate_store: dict[str, list[float]] = defaultdict(list)
-RATE_LIMIT      = 30   # requests
-RATE_WINDOW     = 60   # seconds
+RATE_LIMIT       = 30   # requests
+RATE_WINDOW      = 60   # seconds
+RATE_TABLE_SLOTS = int(os.environ.get('RATE_TABLE_SLOTS', 1 << 18))
+
+# Sliding-window counter per IP: (current window start, previous count,
+# current count). O(1) time and 40 bytes per IP, shared by all workers.
+_rate_table = SharedTable('ratelimit', RATE_TABLE_SLOTS, 'ddd')
+
+
+def _rate_hit(old: tuple | None, now: float):
+    start = now - now % RATE_WINDOW
+    if old is None or old[0] < start - RATE_WINDOW:
+        prev, cur = 0.0, 0.0
+    elif old[0] < start:
+        prev, cur = old[2], 0.0
+    else:
+        prev, cur = old[1], old[2]
+    hits = prev * (1 - (now - start) / RATE_WINDOW) + cur
+    if hits >= RATE_LIMIT:
+        return (start, prev, cur), hits
+    return (start, prev, cur + 1), None
 
 
 def _is_rate_limited(ip: str) -> bool:
-    now    = time.monotonic()
-    window = now - RATE_WINDOW
-    hits   = _rate_store[ip]
-    # Purge old entries
-    _rate_store[ip] = [t for t in hits if t > window]
-    if len(_rate_store[ip]) >= RATE_LIMIT:
-        security_logger.warning('RATE_LIMITED  ip=%s  hits=%d', ip, len(_rate_store[ip]))
+    now  = time.time()
+    hits = _rate_table.update(ip, lambda old: _rate_hit(old, now))
+    if hits is not None:
+        security_logger.warning('RATE_LIMITED  ip=%s  hits=%d', ip, hits)
+        _count('rate_limited')
         return True
-    _rate_store[ip].append(now)
     return False
 
 
-# ── VPN / proxy detection ─────────────────────────────────────────────────────
+def _evict_idle_rate_keys() -> None:
+    # A key untouched for two windows counts as zero hits, same as absent.
+    cutoff = time.time() - 2 * RATE_WINDOW
+    _rate_table.sweep(lambda value, touched: touched < cutoff)
+
 
-_vpn_cache: dict[str, tuple[bool, float]] = {}
-VPN_CACHE_TTL = 600
+_every(RATE_WINDOW, _evict_idle_rate_keys)
 
-_PRIVATE = re.compile(
-    r'^(127\.|10\.|192\.168\.|172\.(1[6-9]|2[0-9]|3[01])\.|::1$|localhost)'
+
+# ── IP reputation ─────────────────────────────────────────────────────────────
+
+# A local index of CIDR ranges consulted before ipapi.is. REPUTATION_DIR holds
+# one file per category (private.txt, tor.txt, vpn.txt, datacenter.txt) with
+# an IP or CIDR per line and '#' comments; the reserved ranges below are
+# always in it. Overlaps are flattened so every address has one category
+# (private beats tor beats vpn beats datacenter), leaving a sorted array of
+# disjoint intervals per address family that a single bisect searches. The
+# files are polled for changes; a new index is built off to the side and
+# swapped in with one assignment, so lookups never wait on a reload.
+
+REPUTATION_DIR      = os.environ.get('REPUTATION_DIR', '')
+REPUTATION_INTERVAL = int(os.environ.get('REPUTATION_INTERVAL', 60))   # seconds between file checks
+# A datacenter address is suspicious but not proof, so by default it is still
+# asked about; set this to block the whole list outright.
+REPUTATION_FLAG_DATACENTER = os.environ.get('REPUTATION_FLAG_DATACENTER', '').lower() in ('1', 'true', 'yes')
+
+REP_PRIVATE, REP_TOR, REP_VPN, REP_DATACENTER = 'private', 'tor', 'vpn', 'datacenter'
+_REP_CATEGORIES = (REP_PRIVATE, REP_TOR, REP_VPN, REP_DATACENTER)   # strongest first
+
+_RESERVED = (
+    '0.0.0.0/8', '10.0.0.0/8', '100.64.0.0/10', '127.0.0.0/8', '169.254.0.0/16',
+    '172.16.0.0/12', '192.0.0.0/24', '192.0.2.0/24', '192.168.0.0/16', '198.18.0.0/15',
+    '198.51.100.0/24', '203.0.113.0/24', '224.0.0.0/3',
+    '::/127', '64:ff9b:1::/48', '100::/64', '2001:db8::/32', 'fc00::/7', 'fe80::/10', 'ff00::/8',
 )
 
+
+def _ip_int(text: str) -> tuple[int, int] | None:
+    """(bits, value) of an IPv4 or IPv6 address; IPv4-mapped IPv6 counts as IPv4."""
+    try:
+        return 32, int.from_bytes(socket.inet_pton(socket.AF_INET, text), 'big')
+    except OSError:
+        pass
+    try:
+        n = int.from_bytes(socket.inet_pton(socket.AF_INET6, text), 'big')
+    except OSError:
+        return None
+    if n >> 32 == 0xFFFF:
+        return 32, n & 0xFFFFFFFF
+    return 128, n
+
+
+def _cidr_range(text: str) -> tuple[int, int, int]:
+    """(bits, first, last) of an address or CIDR block; ValueError if malformed."""
+    addr, _, prefix = text.partition('/')
+    parsed = _ip_int(addr)
+    if parsed is None:
+        raise ValueError(text)
+    bits, n = parsed
+    plen = int(prefix) if prefix else bits
+    if bits == 32 and ':' in addr and prefix:
+        plen -= 96   # ::ffff:a.b.c.d/120 style
+    if not 0 <= plen <= bits:
+        raise ValueError(text)
+    host  = bits - plen
+    first = n >> host << host
+    return bits, first, first | ((1 << host) - 1)
+
+
+def _merge(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sorted disjoint ranges covering the same addresses; touching ones are joined."""
+    out = []
+    for first, last in sorted(ranges):
+        if out and first <= out[-1][1] + 1:
+            if last > out[-1][1]:
+                out[-1] = (out[-1][0], last)
+        else:
+            out.append((first, last))
+    return out
+
+
+def _subtract(ranges: list[tuple[int, int]], cover: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """The parts of `ranges` outside `cover`; both sorted and disjoint."""
+    out, j = [], 0
+    for first, last in ranges:
+        while j < len(cover) and cover[j][1] < first:
+            j += 1
+        k = j
+        while k < len(cover) and cover[k][0] <= last:
+            if cover[k][0] > first:
+                out.append((first, cover[k][0] - 1))
+            first = max(first, cover[k][1] + 1)
+            k += 1
+        if first <= last:
+            out.append((first, last))
+    return out
+
+
+def _flatten(by_category: list[list[tuple[int, int]]]) -> tuple[list[int], list[int], list[int]]:
+    """Disjoint sorted (starts, ends, categories) from overlapping ranges per category.
+
+    Each category is merged on its own, then laid under the ones above it
+    in priority, so only addresses no stronger list claims are kept.
+    """
+    flat, cover = [], []
+    for cat, ranges in enumerate(by_category):
+        own   = _subtract(_merge(ranges), cover)
+        flat += [(first, last, cat) for first, last in own]
+        if cat < len(by_category) - 1:
+            cover = _merge(cover + own)
+    flat.sort()
+    return [r[0] for r in flat], [r[1] for r in flat], [r[2] for r in flat]
+
+
+class ReputationIndex:
+    """Category lookup for addresses over flattened CIDR lists.
+
+    IPv4 intervals live in `array('I')`s (9 bytes each); IPv6 ones need
+    128-bit ints, so they are plain lists.
+    """
+
+    def __init__(self, entries, source: str = ''):
+        """`entries` yields (category, cidr text); malformed lines are counted."""
+        by_family = {32: [[] for _ in _REP_CATEGORIES], 128: [[] for _ in _REP_CATEGORIES]}
+        self.entries = self.skipped = 0
+        for category, text in entries:
+            try:
+                bits, first, last = _cidr_range(text)
+            except ValueError:
+                self.skipped += 1
+                continue
+            by_family[bits][_REP_CATEGORIES.index(category)].append((first, last))
+            self.entries += 1
+        starts, ends, cats = _flatten(by_family[32])
+        self._v4 = (array('I', starts), array('I', ends), array('B', cats))
+        starts, ends, cats = _flatten(by_family[128])
+        self._v6 = (starts, ends, array('B', cats))
+        self.source    = source
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self._v4[0]) + len(self._v6[0])
+
+    def lookup(self, ip: str) -> str | None:
+        """The address's category, or None if no list covers it."""
+        parsed = _ip_int(ip)
+        if parsed is None:
+            return REP_PRIVATE   # not an address (e.g. 'localhost'): nothing to ask ipapi.is
+        bits, n = parsed
+        starts, ends, cats = self._v4 if bits == 32 else self._v6
+        i = bisect_right(starts, n) - 1
+        if i >= 0 and n <= ends[i]:
+            return _REP_CATEGORIES[cats[i]]
+        return None
+
+
+def _reputation_files(directory: str) -> dict[str, str]:
+    if not directory:
+        return {}
+    paths = {c: os.path.join(directory, f'{c}.txt') for c in _REP_CATEGORIES}
+    return {c: p for c, p in paths.items() if os.path.exists(p)}
+
+
+def _reputation_entries(files: dict[str, str]):
+    yield from ((REP_PRIVATE, cidr) for cidr in _RESERVED)
+    for category, path in files.items():
+        with open(path) as f:
+            for line in f:
+                line = line.partition('#')[0].strip()
+                if line:
+                    yield category, line
+
+
+def _load_reputation(directory: str) -> ReputationIndex:
+    t0    = time.perf_counter()
+    index = ReputationIndex(_reputation_entries(_reputation_files(directory)), directory)
+    security_logger.info('REPUTATION_LOADED  dir=%s  entries=%d  intervals=%d  skipped=%d  seconds=%.2f',
+                         directory or '-', index.entries, len(index), index.skipped,
+                         time.perf_counter() - t0)
+    return index
+
+
+def _reputation_signature(directory: str) -> tuple:
+    sig = []
+    for category, path in sorted(_reputation_files(directory).items()):
+        with suppress(OSError):
+            st = os.stat(path)
+            sig.append((category, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+_reputation_sig = _reputation_signature(REPUTATION_DIR)
+_reputation     = _load_reputation(REPUTATION_DIR)
+
+
+def _reload_reputation() -> None:
+    """Rebuild the index if any list file changed; lookups keep the old one meanwhile."""
+    global _reputation, _reputation_sig
+    sig = _reputation_signature(REPUTATION_DIR)
+    if sig == _reputation_sig:
+        return
+    _reputation     = _offload(_load_reputation, REPUTATION_DIR)
+    _reputation_sig = sig
+
+
+if REPUTATION_DIR:
+    _every(REPUTATION_INTERVAL, _reload_reputation)
+
+
+# ── VPN / proxy detection ─────────────────────────────────────────────────────
+
+IPAPI_URL       = os.environ.get('IPAPI_URL', 'https://api.ipapi.is/')
+VPN_TIMEOUT     = 4     # seconds per ipapi.is call
+VPN_FLAGGED_TTL = int(os.environ.get('VPN_FLAGGED_TTL', 3600))
+VPN_CLEAN_TTL   = int(os.environ.get('VPN_CLEAN_TTL', 600))
+VPN_ERROR_TTL   = int(os.environ.get('VPN_ERROR_TTL', 30))
+VPN_CACHE_SLOTS = int(os.environ.get('VPN_CACHE_SLOTS', 1 << 16))
+
+# Verdict states stored in the shared cache as (state, expires_at).
+_VPN_CLEAN, _VPN_FLAGGED, _VPN_ERROR, _VPN_PENDING = range(4)
+
+_vpn_cache   = SharedTable('vpn', VPN_CACHE_SLOTS, 'Bd')
+_vpn_flight  = SingleFlight()
+_vpn_breaker = CircuitBreaker('ipapi', VPN_TIMEOUT)
+
 # Allow bypassing VPN check in development
 _VPN_CHECK_ENABLED = os.environ.get('DISABLE_VPN_CHECK', '').lower() not in ('1', 'true', 'yes')
 
 
-def _is_vpn(ip: str, log_errors: bool = False) -> bool:
-    if not _VPN_CHECK_ENABLED:
-        return False
-    if _PRIVATE.match(ip):
-        return False
+def _vpn_claim(old: tuple | None, now: float):
+    """Serve a fresh verdict, wait on another worker's lookup, or take the lead."""
+    if old is not None and now < old[1]:
+        return old, ('wait' if old[0] == _VPN_PENDING else 'hit', old[0])
+    return (_VPN_PENDING, now + VPN_TIMEOUT + 1), ('lead', None)
 
-    now    = time.monotonic()
-    cached = _vpn_cache.get(ip)
-    if cached and now - cached[1] < VPN_CACHE_TTL:
-        return cached[0]
 
+def _vpn_fetch(ip: str, log_errors: bool) -> tuple[int, bool]:
+    if not _vpn_breaker.allow():
+        return _VPN_ERROR, False  # ipapi.is is down: fail open without waiting
+    t0, ok = time.perf_counter(), False
     try:
         resp = requests.get(
-            f'https://api.ipapi.is/?q={ip}',
-            timeout=4,
+            IPAPI_URL,
+            params={'q': ip},
+            timeout=_vpn_breaker.timeout(),
             headers={'Accept': 'application/json'},
         )
         resp.raise_for_status()
-        d = resp.json()
+        d  = resp.json()
+        ok = True
+    except requests.RequestException as exc:
+        _count('upstream_errors', upstream='ipapi')
+        if log_errors:
+            security_logger.error('VPN_CHECK_ERROR  ip=%s  error=%s', ip, exc)
+        return _VPN_ERROR, False  # fail open, but remember it briefly
+    finally:
+        elapsed = time.perf_counter() - t0
+        _vpn_breaker.record(elapsed, ok)
+        _observe('upstream_seconds', elapsed, upstream='ipapi')
+
+    flagged = any([
+        d.get('is_vpn'),
+        d.get('is_proxy'),
+        d.get('is_tor'),
+        d.get('is_relay'),
+    ])
+    if flagged:
+        flags = [k for k in ('is_vpn', 'is_proxy', 'is_tor', 'is_relay') if d.get(k)]
+        security_logger.warning('VPN_DETECTED  ip=%s  flags=%s', ip, ','.join(flags))
+    return (_VPN_FLAGGED if flagged else _VPN_CLEAN), flagged
+
+
+def _vpn_lookup(ip: str, log_errors: bool) -> int:
+    waited = False
+    while True:
+        now = time.time()
+        action, state = _vpn_cache.update(ip, lambda old: _vpn_claim(old, now))
+        if action == 'hit':
+            _count('vpn_cache_hit')
+            return state
+        if action == 'lead':
+            break
+        # Another worker is asking ipapi.is about this IP right now.
+        if not waited:
+            _count('vpn_cache_coalesced')
+            waited = True
+        time.sleep(0.05)
+
+    _count('vpn_cache_miss')
+    state, _ = _vpn_fetch(ip, log_errors)
+    ttl = {_VPN_FLAGGED: VPN_FLAGGED_TTL, _VPN_CLEAN: VPN_CLEAN_TTL}.get(state, VPN_ERROR_TTL)
+    _vpn_cache.put(ip, (state, time.time() + ttl))
+    return state
+
+
+def _vpn_state(ip: str, log_errors: bool = False) -> int:
+    """_VPN_CLEAN, _VPN_FLAGGED or _VPN_ERROR (lookup failed, treated as clean)."""
+    category = _reputation.lookup(ip)
+    _count(f'reputation_{category or "unknown"}')
+    if category == REP_PRIVATE:
+        return _VPN_CLEAN
+    if category in (REP_TOR, REP_VPN) or (category == REP_DATACENTER and REPUTATION_FLAG_DATACENTER):
+        return _VPN_FLAGGED
+
+    state, shared = _vpn_flight.do(ip, lambda: _vpn_lookup(ip, log_errors))
+    if shared:
+        _count('vpn_cache_coalesced')
+    return state
+
 
-        flagged = any([
-            d.get('is_vpn'),
-            d.get('is_proxy'),
-            d.get('is_tor'),
-            d.get('is_relay'),
-        ])
-        _vpn_cache[ip] = (flagged, now)
+def _is_vpn(ip: str, log_errors: bool = False) -> bool:
+    return _VPN_CHECK_ENABLED and _vpn_state(ip, log_errors) == _VPN_FLAGGED
 
-        if flagged:
-            flags = [k for k in ('is_vpn', 'is_proxy', 'is_tor', 'is_relay') if d.get(k)]
-            security_logger.warning('VPN_DETECTED  ip=%s  flags=%s', ip, ','.join(flags))
 
-        return flagged
+def _evict_expired_vpn_verdicts() -> None:
+    now = time.time()
+    _vpn_cache.sweep(lambda value, touched: value[1] <= now)
 
-    except requests.RequestException as exc:
-        if log_errors:
-            security_logger.error('VPN_CHECK_ERROR  ip=%s  error=%s', ip, exc)
-        return False  # fail open
+
+_every(60, _evict_expired_vpn_verdicts)
+
+
+# ── VPN verdict tokens ────────────────────────────────────────────────────────
+
+# /check-ip hands a client whose IP came back clean a signed token (cookie
+# "verdict", also in the JSON body for API clients, who send it back as
+# X-Verdict). /generate then trusts it until it expires instead of asking
+# the cache or ipapi.is again, so a worker or instance that has never seen
+# the IP still answers without a round-trip.
+#
+#   v1.<key id>.<expires>.<signature>
+#
+# The signature is HMAC-SHA256 over key id, expiry and the client's IP
+# (VERDICT_BIND=ip), its /24 or /64 (=net, survives address churn inside a
+# carrier pool) or nothing (=none). VERDICT_KEYS is a comma-separated list:
+# the first key signs, all of them verify, so a new key can go in front and
+# the old one come out once VERDICT_TTL has passed. Without VERDICT_KEYS
+# the workers of one host share a random key in SHARED_STATE_DIR; set it
+# when several instances serve the same clients. VERDICT_TTL=0 turns the
+# tokens off. Flagged and failed lookups never get a token.
+
+VERDICT_TTL    = int(os.environ.get('VERDICT_TTL', VPN_CLEAN_TTL))
+VERDICT_BIND   = os.environ.get('VERDICT_BIND', 'ip').lower()
+VERDICT_COOKIE = 'verdict'
+VERDICT_HEADER = 'X-Verdict'
+
+if VERDICT_BIND not in ('ip', 'net', 'none'):
+    raise RuntimeError(f'VERDICT_BIND must be ip, net or none, not {VERDICT_BIND!r}')
+
+
+def _verdict_secrets() -> list[bytes]:
+    keys = [k.strip().encode() for k in os.environ.get('VERDICT_KEYS', '').split(',') if k.strip()]
+    if keys:
+        return keys
+    path = os.path.join(SHARED_STATE_DIR, 'spacegen-verdict.key')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):   # another worker is writing it
+            with open(path, 'rb') as f:
+                key = f.read()
+            if key:
+                return [key]
+            time.sleep(0.01)
+        raise RuntimeError(f'{path} is empty')
+    key = secrets.token_hex(32).encode()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return [key]
+
+
+# key id (first 8 hex digits of the key's SHA-256) -> key; the first signs
+_verdict_keys    = {hashlib.sha256(k).hexdigest()[:8]: k for k in _verdict_secrets()}
+_verdict_signing = next(iter(_verdict_keys))
+
+
+def _verdict_subject(ip: str) -> str:
+    if VERDICT_BIND == 'none':
+        return ''
+    if VERDICT_BIND == 'net':
+        parsed = _ip_int(ip)
+        if parsed is not None:
+            bits, n = parsed
+            keep    = 24 if bits == 32 else 64
+            return f'{bits}:{n >> (bits - keep):x}'
+    return ip
+
+
+def _verdict_sign(kid: str, expires: int, ip: str) -> str:
+    msg = f'{kid}.{expires}.{_verdict_subject(ip)}'.encode()
+    return hmac.new(_verdict_keys[kid], msg, hashlib.sha256).hexdigest()[:32]
+
+
+def _issue_verdict(ip: str) -> str:
+    expires = int(time.time()) + VERDICT_TTL
+    _count('verdict_tokens', result='issued')
+    return f'v1.{_verdict_signing}.{expires}.{_verdict_sign(_verdict_signing, expires, ip)}'
+
+
+def _verdict_valid(token: str, ip: str) -> bool:
+    """True if `token` is an unexpired verdict issued to `ip` under a current key."""
+    try:
+        version, kid, expires, sig = token.split('.')
+        expires = int(expires)
+    except ValueError:
+        version = None
+    if version != 'v1' or kid not in _verdict_keys:
+        result = 'malformed'
+    elif expires <= time.time():
+        result = 'expired'
+    elif not hmac.compare_digest(sig.encode('utf-8', 'replace'), _verdict_sign(kid, expires, ip).encode()):
+        # bytes, as str compare_digest raises on non-ASCII input
+        result = 'bad_signature'   # forged, another IP's, or signed with a retired key
+    else:
+        result = 'valid'
+    _count('verdict_tokens', result=result)
+    return result == 'valid'
+
+
+def _request_verdict(ip: str) -> bool:
+    """Whether this request carries a valid verdict token for `ip`."""
+    if not VERDICT_TTL:
+        return False
+    token = request.headers.get(VERDICT_HEADER) or request.cookies.get(VERDICT_COOKIE)
+    return bool(token) and _verdict_valid(token, ip)
 
 
 # ── Platform definitions ──────────────────────────────────────────────────────
@@ -143,7 +1153,7 @@ PLATFORMS = {
     'steam':   {'label': 'Steam',    'min': 3,  'max': 32, 'check': False},
 }
 
-VALID_STYLES    = {'unique', 'rank', 'aesthetic', 'leet', 'themed', 'custom'}
+VALID_STYLES    = {'unique', 'rank', 'aesthetic', 'leet', 'themed', 'custom', 'pronounceable'}
 VALID_PLATFORMS = set(PLATFORMS.keys())
 
 # ── Word lists ────────────────────────────────────────────────────────────────
@@ -166,32 +1176,327 @@ THEMES   = {
 }
 
 
+# ── Word corpora ──────────────────────────────────────────────────────────────
+
+# The lists above are the built-in corpus. WORDS_DIR adds to it with text
+# files of one word per line: prefixes.txt, suffixes.txt and theme_<name>.txt
+# (a new name is a new theme). The merged lists are packed once into a
+# read-only file under SHARED_STATE_DIR and mmapped, so every worker on the
+# host shares one copy through the page cache. Each list is split by word
+# length and each length group stored as its words back to back at a fixed
+# width: word i is at offset + i * width, so sampling is O(1) and nothing is
+# decoded up front. Groups of up to WORDS_DECODE words are decoded once, when
+# a grammar first uses them, since sampling a tuple skips the per-word
+# decode. Lists named 'themes' (every theme word) and 'tails' (prefixes and
+# suffixes) are derived.
+
+WORDS_DIR      = os.environ.get('WORDS_DIR', '')
+WORDS_MAX_LEN  = 20
+WORDS_DECODE   = 4096   # groups up to this size are sampled from a decoded tuple
+_WORD_OK       = re.compile(r'[a-z0-9]+').fullmatch
+_CORPUS_HEADER = struct.Struct('<I')   # length of the JSON index that follows
+
+
+class _Words:
+    """Read-only sequence of equal-width words in a shared buffer."""
+
+    __slots__ = ('buf', 'start', 'count', 'stride', 'width', 'decoded')
+
+    def __init__(self, buf, start: int, count: int, stride: int, width: int | None = None,
+                 decoded: dict | None = None):
+        self.buf, self.start, self.count, self.stride = buf, start, count, stride
+        self.width   = stride if width is None else width
+        self.decoded = {} if decoded is None else decoded   # width -> tuple, shared by cuts
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        at = self.start + i * self.stride
+        return self.buf[at:at + self.width].decode('ascii')
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    def cut(self, width: int) -> '_Words':
+        """The same words cut to their first `width` characters."""
+        return _Words(self.buf, self.start, self.count, self.stride, min(width, self.width), self.decoded)
+
+    def sampleable(self) -> 'tuple[str, ...] | _Words':
+        """A tuple of the words if the group is small enough to keep decoded."""
+        if self.count > WORDS_DECODE:
+            return self
+        words = self.decoded.get(self.width)
+        if words is None:
+            words = self.decoded[self.width] = tuple(self)
+        return words
+
+
+def _corpus_files(directory: str) -> dict[str, str]:
+    if not directory:
+        return {}
+    return {os.path.basename(p)[:-4]: p for p in sorted(glob.glob(os.path.join(directory, '*.txt')))}
+
+
+def _build_corpus(path: str, files: dict[str, str]) -> None:
+    lists = {'prefixes': set(PREFIXES), 'suffixes': set(SUFFIXES),
+             **{f'theme_{k}': set(v) for k, v in THEMES.items()}}
+    for name, source in files.items():
+        with open(source, encoding='utf-8', errors='ignore') as f:
+            words = (w.strip().lower() for w in f)
+            lists.setdefault(name, set()).update(
+                w for w in words if len(w) <= WORDS_MAX_LEN and _WORD_OK(w))
+    lists['themes'] = set().union(*(v for k, v in lists.items() if k.startswith('theme_')))
+    lists['tails']  = lists['prefixes'] | lists['suffixes']
+
+    index, chunks, offset = {}, [], 0
+    for name, words in sorted(lists.items()):
+        groups: dict[int, list[str]] = {}
+        for w in sorted(words):
+            groups.setdefault(len(w), []).append(w)
+        index[name] = {}
+        for width, group in sorted(groups.items()):
+            index[name][width] = [offset, len(group)]
+            chunks.append(''.join(group).encode('ascii'))
+            offset += width * len(group)
+    head = json.dumps(index).encode()
+    tmp  = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_CORPUS_HEADER.pack(len(head)))
+        f.write(head)
+        f.writelines(chunks)
+    os.replace(tmp, path)   # other workers see the old file or the whole new one
+
+
+def _load_corpus(directory: str) -> dict[str, dict[int, _Words]]:
+    """Map the packed corpus, building it first if no worker has yet."""
+    t0    = time.perf_counter()
+    files = _corpus_files(directory)
+    key   = hashlib.blake2b(json.dumps([PREFIXES, SUFFIXES, THEMES, WORDS_MAX_LEN]).encode(),
+                            digest_size=8)
+    for name, source in files.items():
+        st = os.stat(source)
+        key.update(f'{name}:{st.st_size}:{st.st_mtime_ns};'.encode())
+    path = os.path.join(SHARED_STATE_DIR, f'spacegen-words-{key.hexdigest()}.bin')
+    if not os.path.exists(path):
+        _build_corpus(path, files)
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (n,)  = _CORPUS_HEADER.unpack_from(mm)
+    base  = _CORPUS_HEADER.size + n
+    index = json.loads(mm[_CORPUS_HEADER.size:base])
+    corpus = {name: {int(w): _Words(mm, base + off, count, int(w)) for w, (off, count) in groups.items()}
+              for name, groups in index.items()}
+    security_logger.info('WORDS_LOADED  lists=%d  words=%d  bytes=%d  seconds=%.3f',
+                         len(corpus), sum(len(g) for groups in corpus.values() for g in groups.values()),
+                         len(mm), time.perf_counter() - t0)
+    return corpus
+
+
+_corpus = _load_corpus(WORDS_DIR)
+
+
 # ── Validation ────────────────────────────────────────────────────────────────
 
-def _is_valid(username: str, platform: str) -> bool:
-    """Validate a username against platform-specific rules."""
+# Each platform's rules are compiled once. One anchored pattern answers
+# "valid?"; only names that fail it are run through the individual rules to
+# say why, in the order below.
+_CHARSETS = {
+    'roblox':  r'a-zA-Z0-9_',
+    'discord': r'a-z0-9_.',
+    'tiktok':  r'a-zA-Z0-9_.',
+    'youtube': r'a-zA-Z0-9_\-',
+    'twitch':  r'a-zA-Z0-9_',
+    'steam':   r'a-zA-Z0-9_\-',
+}
+REJECT_REASONS = ('too_short', 'too_long', 'bad_chars',
+                  'leading_underscore', 'trailing_underscore', 'double_underscore')
+
+
+def _rule_pattern(platform: str) -> str:
+    """The platform's rules as one unanchored regex over a single name."""
     p = PLATFORMS[platform]
-    if not (p['min'] <= len(username) <= p['max']):
-        return False
+    body = f'[{_CHARSETS[platform]}]{{{p["min"]},{p["max"]}}}'
     if platform == 'roblox':
-        # Roblox: alphanumeric + single underscore, not at start/end
-        if username.startswith('_') or username.endswith('_'):
-            return False
-        if '__' in username:          # BUG FIX: was `count('_') > 1` which
-            return False              # wrongly rejected "a_b_c" (2 underscores
-        # but no consecutive ones)   # when Roblox only bans consecutive pairs
-        return bool(re.match(r'^[a-zA-Z0-9_]+$', username))
-    elif platform == 'discord':
-        return bool(re.match(r'^[a-z0-9_.]{2,32}$', username))
-    elif platform == 'tiktok':
-        return bool(re.match(r'^[a-zA-Z0-9_.]{2,24}$', username))
-    elif platform == 'youtube':
-        return bool(re.match(r'^[a-zA-Z0-9_\-]{3,30}$', username))
-    elif platform == 'twitch':
-        return bool(re.match(r'^[a-zA-Z0-9_]{4,25}$', username))
-    elif platform == 'steam':
-        return bool(re.match(r'^[a-zA-Z0-9_\-]{3,32}$', username))
-    return False
+        # Roblox: alphanumeric + underscores, none at start/end and no two in
+        # a row ("a_b_c" is fine, "a__b" is not)
+        return r'(?!_)(?!.*__)' + body + r'(?<!_)'
+    return body
+
+
+class _Validator:
+    def __init__(self, platform: str):
+        p = PLATFORMS[platform]
+        self.min, self.max = p['min'], p['max']
+        self.match = re.compile(_rule_pattern(platform)).fullmatch
+        rules = [('bad_chars', re.compile(f'[^{_CHARSETS[platform]}]').search)]
+        if platform == 'roblox':
+            rules += [('leading_underscore',  re.compile('_').match),
+                      ('trailing_underscore', re.compile(r'_\Z').search),
+                      ('double_underscore',   re.compile('__').search)]
+        self.rules = tuple(rules)
+
+    def reasons(self, name: str) -> tuple[str, ...]:
+        """Every rule `name` breaks, in REJECT_REASONS order; () when valid."""
+        if self.match(name):
+            return ()
+        out = ['too_short'] if len(name) < self.min else ['too_long'] if len(name) > self.max else []
+        return (*out, *(reason for reason, broken in self.rules if broken(name)))
+
+
+_VALIDATORS = {name: _Validator(name) for name in PLATFORMS}
+
+
+def _is_valid(username: str, platform: str) -> bool:
+    """Validate a username against platform-specific rules."""
+    return _VALIDATORS[platform].match(username) is not None
+
+
+# The same rules as one multi-line pattern per platform, so a whole batch can
+# be validated with a single regex scan instead of a call per name.
+_BULK_RE = {name: re.compile(f'^{_rule_pattern(name)}$', re.MULTILINE) for name in PLATFORMS}
+
+
+def _valid_many(names: list[str], platform: str) -> list[str]:
+    """Return the members of `names` that pass `_is_valid`, in order."""
+    blob = '\n'.join(names)
+    if blob.count('\n') == len(names) - 1:
+        return _BULK_RE[platform].findall(blob)
+    # A name with an embedded newline would split into two lines.
+    return [un for un in names if '\n' not in un and _is_valid(un, platform)]
+
+
+VALIDATE_MAX_NAMES = int(os.environ.get('VALIDATE_MAX_NAMES', 100_000))   # per /validate request
+VALIDATE_MAX_BYTES = 64 * VALIDATE_MAX_NAMES   # JSON bodies are parsed whole, so they are capped
+VALIDATE_LINE_MAX  = 256                       # longer lines are cut; every platform rejects them anyway
+VALIDATE_FLUSH     = 1000                      # records per streamed chunk
+
+
+def _validation_records(names, platforms: list[str]):
+    """NDJSON ``result`` records for `names` (any iterable), then a ``summary``.
+
+    The part of a record after the name depends only on which rules the
+    name broke, so it is rendered once per distinct outcome.
+    """
+    names      = iter(names)
+    checks     = [_VALIDATORS[platform].reasons for platform in platforms]
+    outcomes   = {}   # reasons per platform -> (rendered tail, platforms passed)
+    valid      = dict.fromkeys(platforms, 0)
+    seen, out  = 0, []
+    for name in itertools.islice(names, VALIDATE_MAX_NAMES):
+        seen += 1
+        why   = tuple([check(name) for check in checks])
+        found = outcomes.get(why)
+        if found is None:
+            passed = [platform for platform, r in zip(platforms, why) if not r]
+            tail   = json.dumps({'valid': passed,
+                                 'rejected': {platform: r for platform, r in zip(platforms, why) if r}})
+            found  = outcomes[why] = (', ' + tail[1:] + '\n', passed)
+        for platform in found[1]:
+            valid[platform] += 1
+        out.append('{"type": "result", "name": ' + json.dumps(name) + found[0])
+        if len(out) == VALIDATE_FLUSH:
+            yield ''.join(out)
+            out = []
+    if out:
+        yield ''.join(out)
+    truncated = next(names, None) is not None
+    yield json.dumps({'type': 'summary', 'names': seen, 'valid': valid, 'truncated': truncated}) + '\n'
+
+
+# ── Pronounceable style ───────────────────────────────────────────────────────
+
+# A character Markov chain: the next letter is drawn given the previous
+# MARKOV_ORDER letters, with frequencies counted from a word list -- the
+# corpus's 'markov' list if WORDS_DIR has a markov.txt, else every corpus
+# word. Each context's distribution is precomputed as a MARKOV_TABLE-long
+# lookup table in which each letter appears in proportion to its
+# probability, so a draw is one random byte used as an index (an alias table
+# with 1/256 resolution; rarer transitions drop out). '$' marks the end of a
+# word: the chain restarts and keeps going until the requested length.
+
+MARKOV_ORDER       = 2
+MARKOV_TABLE       = 256
+MARKOV_TRAIN_WORDS = 50_000   # evenly spaced sample of a bigger list
+_MARKOV_START      = '^' * MARKOV_ORDER
+
+
+def _markov_counts(words) -> dict[str, Counter]:
+    counts: dict[str, Counter] = {}
+    for w in words:
+        padded = _MARKOV_START + w + '$'
+        for i in range(MARKOV_ORDER, len(padded)):
+            counts.setdefault(padded[i - MARKOV_ORDER:i], Counter())[padded[i]] += 1
+    return counts
+
+
+def _markov_words() -> list[str]:
+    lists  = [_corpus['markov']] if 'markov' in _corpus else _corpus.values()
+    words  = [w for groups in lists for group in groups.values() for w in group if w.isalpha()]
+    stride = max(1, len(words) // MARKOV_TRAIN_WORDS)
+    return words[::stride]
+
+
+_markov = _markov_counts(_markov_words())
+
+
+@lru_cache(maxsize=None)
+def _markov_tables(platform: str) -> tuple | None:
+    """The start context's table, keeping only letters `platform` allows.
+
+    Each table entry is a ``(letter, next table)`` pair, so a step is one
+    index and no context string is rebuilt; '$' entries emit nothing and
+    lead back to the start table, as do contexts never seen in training.
+    """
+    allowed = re.compile(f'[{_CHARSETS[platform]}$]').fullmatch
+    picks   = {}
+    for ctx, counts in _markov.items():
+        kept  = {c: k for c, k in counts.items() if allowed(c)}
+        total = sum(kept.values())
+        if not total:
+            continue
+        # Largest-remainder rounding so every table is exactly MARKOV_TABLE long.
+        exact = {c: k * MARKOV_TABLE / total for c, k in kept.items()}
+        slots = {c: int(x) for c, x in exact.items()}
+        for c in sorted(exact, key=lambda c: slots[c] - exact[c])[:MARKOV_TABLE - sum(slots.values())]:
+            slots[c] += 1
+        picks[ctx] = ''.join(c * k for c, k in sorted(slots.items()))
+    if _MARKOV_START not in picks:
+        return None
+    tables = {ctx: [] for ctx in picks}
+    for ctx, letters in picks.items():
+        for c in letters:
+            if c == '$':
+                tables[ctx].append(('', tables[_MARKOV_START]))
+            else:
+                tables[ctx].append((c, tables.get(ctx[1:] + c, tables[_MARKOV_START])))
+    return tables[_MARKOV_START]
+
+
+def _markov_batch(length: int, platform: str, n: int) -> list[str]:
+    """`n` names of exactly `length` letters walked from the chain."""
+    start = _markov_tables(platform)
+    if start is None or length < 1:
+        return []
+    out, name, table = [], '', start
+    while len(out) < n:
+        for b in random.randbytes((n - len(out)) * (length + 4)):   # a few '$' draws per name
+            c, table = table[b]
+            name += c
+            if len(name) == length:
+                out.append(name)
+                if len(out) == n:
+                    break
+                name, table = '', start
+    return out
+
+
+for _platform in PLATFORMS:   # build every table now, not on a first request
+    _markov_tables(_platform)
 
 
 # ── Generation ────────────────────────────────────────────────────────────────
@@ -224,6 +1529,7 @@ def _fit(username: str, target: int) -> str:
 
 
 def _generate_one(style: str, length: int, base: str | None, platform: str) -> str | None:
+    """Generate a single candidate; the scalar reference for _generate_batch."""
     p      = PLATFORMS[platform]
     length = max(p['min'], min(p['max'], length))
 
@@ -275,6 +1581,9 @@ def _generate_one(style: str, length: int, base: str | None, platform: str) -> s
         username = random.choice(variations)
         username = _fit(username, min(length, p['max']))
 
+    elif style == 'pronounceable':
+        username = (_markov_batch(length, platform, 1) or [None])[0]
+
     if username is None:
         return None
 
@@ -285,135 +1594,1370 @@ def _generate_one(style: str, length: int, base: str | None, platform: str) -> s
     return username if _is_valid(username, platform) else None
 
 
+# ── Batch generation ──────────────────────────────────────────────────────────
+
+# Each style compiles, per (length, base, platform), into a grammar: weighted
+# alternatives made of slots. A slot is ``(choices, repeat)`` -- a string of
+# characters drawn `repeat` times, or a tuple of equal-length words drawn
+# once. Fitting, trimming and base sanitising happen at compile time, so the
+# grammar only emits names that pass the platform rules, in the same
+# proportions _generate_one's rejection sampling would. The product of slot
+# sizes also says up front how many distinct names a request can get.
+
+GEN_BATCH       = 256
+GEN_ENUM_FACTOR = 20       # enumerate when fewer than count * this names exist...
+GEN_ENUM_LIMIT  = 50_000   # ...and no more than this many
+
+_SEPS          = {'roblox': '_', 'discord': '_.', 'tiktok': '_.',
+                  'youtube': '_-', 'twitch': '_', 'steam': '_-'}
+_UNIQUE_CHARS  = string.ascii_lowercase + string.digits
+_AESTHETIC     = 'bcdfghjklmnpqrstvwxyz' + string.digits
+_LEET_TABLE    = str.maketrans(LEET_MAP)
+_LEET_CHARS    = string.ascii_lowercase.translate(_LEET_TABLE)
+_HAS_SEP       = re.compile(r'[_.\-]').search
+
+
+class _Grammar(NamedTuple):
+    alts:    tuple    # ((slots, sep_prob), ...)
+    weights: tuple
+    size:    int      # upper bound on distinct names
+
+
+def _distinct(choices) -> int:
+    # Corpus groups are deduplicated when packed; a cut group may repeat, but
+    # this only feeds an upper bound.
+    return len(choices) if isinstance(choices, _Words) else len(set(choices))
+
+
+def _pair_slots(heads: dict[int, _Words], tails: dict[int, _Words], length: int,
+                sep_prob: float) -> list:
+    """Head + tail alternatives, widths that fit `length` exactly first.
+
+    Widths further off (padded with digits, then cut) are added in turn
+    until the pairs can make GEN_ENUM_LIMIT names, so a large corpus sticks
+    to exact fits while the small built-in one keeps all of its variety.
+    A width with no more than GEN_ENUM_LIMIT pairs is joined into a single
+    word tuple: one alternative per width keeps batches from being spread
+    over dozens of tiny head x tail alternatives.
+    """
+    widths: dict[int, list] = {}
+    for a, h in heads.items():
+        for b, t in tails.items():
+            widths.setdefault(a + b, []).append((h, t))
+    out, total = [], 0
+    for width in sorted(widths, key=lambda w: (w > length, abs(length - w))):
+        if total >= GEN_ENUM_LIMIT:
+            break
+        pairs = sum(len(h) * len(t) for h, t in widths[width])
+        total += pairs
+        if pairs <= GEN_ENUM_LIMIT:
+            joined = tuple(x + y for h, t in widths[width] for x in h.sampleable() for y in t.sampleable())
+            out.append((pairs, _fit_slots([(joined, 1)], length), sep_prob))
+            continue
+        for h, t in widths[width]:
+            out.append((len(h) * len(t), _fit_slots([(h, 1), (t, 1)], length), sep_prob))
+    return out
+
+
+def _fit_slots(slots: list, target: int) -> list:
+    """Slot form of `_fit`: cut at `target` characters or pad with digits."""
+    out, room = [], target
+    for choices, rep in slots:
+        if not rep:
+            continue
+        width = len(choices[0]) * rep
+        if width <= room:
+            out.append((choices.sampleable() if isinstance(choices, _Words) else choices, rep))
+            room -= width
+        elif room:
+            out.append((choices, room) if isinstance(choices, str)
+                       else (choices.cut(room).sampleable(), 1) if isinstance(choices, _Words)
+                       else (tuple(c[:room] for c in choices), 1))
+            room = 0
+    if room:
+        out.append((string.digits, room))
+    return out
+
+
+def _clean_base(base: str, platform: str, charset: str | None = None) -> str:
+    """Strip characters the platform can't use from a user-supplied word."""
+    cleaned = re.sub(f'[^{charset or _CHARSETS[platform]}]', '', base)
+    if platform == 'discord':
+        cleaned = cleaned.lower()
+    if platform == 'roblox':
+        cleaned = re.sub('_+', '_', cleaned).strip('_')
+    return cleaned
+
+
+def _roblox_edges(weight: float, slots: list) -> float:
+    """Drop choices that would put `_` at either end; return the new weight."""
+    for i, bad in ((0, lambda c: c[0] == '_'), (-1, lambda c: c[-1] == '_')):
+        choices, rep = slots[i]
+        if isinstance(choices, _Words):
+            continue   # corpus words are [a-z0-9] only
+        kept = [c for c in choices if not bad(c)]
+        if len(kept) < len(choices):
+            weight *= len(kept) / len(choices)
+            slots[i] = (''.join(kept) if isinstance(choices, str) else tuple(kept), rep)
+    return weight if all(choices for choices, _ in slots) else 0
+
+
+def _style_slots(style: str, length: int, base: str | None, platform: str) -> list:
+    """Raw ``(weight, slots, sep_prob)`` alternatives before fitting rules."""
+    seps = _SEPS[platform]
+    if style == 'unique':
+        return [(1, [(_UNIQUE_CHARS, length)], 0.3)]
+    if style == 'rank':
+        return _pair_slots(_corpus['prefixes'], _corpus['suffixes'], length, 0.2)
+    if style == 'aesthetic':
+        half  = length // 2
+        slots = [(_AESTHETIC, half), (seps, 1), (_AESTHETIC, length - half)]
+        return [(1, _fit_slots(slots, min(length + 1, PLATFORMS[platform]['max'])), 0)]
+    if style == 'leet':
+        if not base:
+            return [(1, _fit_slots([(_LEET_CHARS, 4)], length), 0.4)]
+        word = _clean_base(base.lower().translate(_LEET_TABLE), platform)
+        return [(1, _fit_slots([((word,), 1)], length), 0.4)] if word else []
+    if style == 'themed':
+        heads = _corpus.get(f'theme_{(base or "").lower()}', _corpus['themes'])
+        return _pair_slots(heads, _corpus['tails'], length, 0)
+    if style == 'custom' and base:
+        word = _clean_base(base, platform, 'a-zA-Z0-9')[:20]
+        if not word:
+            return []
+        cb = (word,)
+        pre, suf     = _corpus['prefixes'], _corpus['suffixes']
+        n_suf, n_pre = sum(map(len, suf.values())), sum(map(len, pre.values()))
+        raw  = [(1 / 15, [(cb, 1), (string.digits, k)]) for k in (1, 2, 3)]
+        raw += [(1 / 5, [(string.ascii_lowercase, 1), (cb, 1)])]
+        raw += [(1 / 15, [(cb, 1), (seps, 1), (_UNIQUE_CHARS, k)]) for k in (1, 2, 3)]
+        raw += [(len(g) / n_suf / 5, [(cb, 1), (g, 1)]) for g in suf.values()]
+        raw += [(len(g) / n_pre / 5, [(g, 1), (cb, 1)]) for g in pre.values()]
+        return [(w, _fit_slots(slots, length), 0) for w, slots in raw]
+    return []
+
+
+@lru_cache(maxsize=1024)
+def _grammar(style: str, length: int, base: str | None, platform: str) -> _Grammar:
+    p      = PLATFORMS[platform]
+    length = max(p['min'], min(p['max'], length))
+    alts, weights, size = [], [], 0
+    for weight, slots, sep_prob in _style_slots(style, length, base, platform):
+        if platform == 'roblox':
+            weight = _roblox_edges(weight, slots)
+        if not weight:
+            continue
+        n = 1
+        for choices, rep in slots:
+            n *= _distinct(choices) ** rep
+        width = sum(len(choices[0]) * rep for choices, rep in slots)
+        if sep_prob and width > 4:
+            n *= 1 + (width - 2) * len(_SEPS[platform])
+        alts.append((tuple(slots), sep_prob))
+        weights.append(weight)
+        size += n
+    return _Grammar(tuple(alts), tuple(weights), size)
+
+
+@lru_cache(maxsize=64)
+def _enumerate(style: str, length: int, base: str | None, platform: str) -> tuple[str, ...]:
+    """Every distinct valid name a small grammar can produce."""
+    mx, seps, names = PLATFORMS[platform]['max'], _SEPS[platform], set()
+    for slots, sep_prob in _grammar(style, length, base, platform).alts:
+        pools = [tuple(set(choices)) for choices, rep in slots for _ in range(rep)]
+        for combo in itertools.product(*pools):
+            un = ''.join(combo)
+            names.add(un[:mx])
+            if sep_prob and len(un) > 4 and not _HAS_SEP(un):
+                names.update((un[:pos] + s + un[pos:])[:mx]
+                             for pos in range(1, len(un) - 1) for s in seps)
+    return tuple(_valid_many(sorted(names), platform))
+
+
+def _chunks(chars: str, size: int, n: int) -> list[str]:
+    """`n` random strings of `size` characters drawn from `chars`."""
+    blob = ''.join(random.choices(chars, k=size * n))
+    return [blob[i:i + size] for i in range(0, size * n, size)]
+
+
+def _maybe_sep_many(names: list[str], platform: str, prob: float) -> list[str]:
+    """Batch form of `_maybe_sep`."""
+    seps, rnd, out = _SEPS[platform], random.random, []
+    for un in names:
+        if rnd() < prob and len(un) > 4 and not _HAS_SEP(un):
+            pos = 1 + int(rnd() * (len(un) - 2))
+            un  = un[:pos] + seps[int(rnd() * len(seps))] + un[pos:]
+        out.append(un)
+    return out
+
+
+def _generate_batch(style: str, length: int, base: str | None, platform: str,
+                    n: int = GEN_BATCH) -> list[str]:
+    """Sample `n` candidates from the style's grammar (may repeat)."""
+    if style == 'pronounceable':
+        length = max(PLATFORMS[platform]['min'], min(PLATFORMS[platform]['max'], length))
+        return _valid_many(_markov_batch(length, platform, n), platform)
+    g = _grammar(style, length, base, platform)
+    if not g.alts:
+        return []
+    picks = [0] * n if len(g.alts) == 1 else random.choices(range(len(g.alts)), g.weights, k=n)
+
+    names: list[str] = []
+    for i, k in Counter(picks).items():
+        slots, sep_prob = g.alts[i]
+        cols  = [_chunks(choices, rep, k) if isinstance(choices, str) else random.choices(choices, k=k)
+                 for choices, rep in slots]
+        batch = [''.join(parts) for parts in zip(*cols)]
+        names.extend(_maybe_sep_many(batch, platform, sep_prob) if sep_prob else batch)
+    if len(g.alts) > 1:
+        random.shuffle(names)
+
+    mx = PLATFORMS[platform]['max']
+    return _valid_many([un[:mx] for un in names], platform)
+
+
 def generate_usernames(style: str, length: int, platform: str,
                        base: str | None = None, count: int = 10) -> list[str]:
-    results: set[str] = set()
-    attempts = 0
-    max_attempts = count * 100  # increased ceiling for harder constraints
-    while len(results) < count and attempts < max_attempts:
-        attempts += 1
-        candidate = _generate_one(style, length, base, platform)
-        if candidate:
-            results.add(candidate)
+    g = _grammar(style, length, base, platform)
+    if not g.size and style != 'pronounceable':   # the chain has no grammar
+        return []   # nothing valid can come out of this combination
+    if 0 < g.size < min(count * GEN_ENUM_FACTOR, GEN_ENUM_LIMIT):
+        # Too few names for sampling to find `count` of them cheaply: list
+        # them all and draw without replacement.
+        names = _enumerate(style, length, base, platform)
+        return random.sample(names, min(count, len(names)))
+
+    results: dict[str, None] = {}   # ordered set: keeps generation order
+    budget = count * 100            # candidate ceiling for harder constraints
+    drawn  = 0
+    while len(results) < count and budget > 0:
+        n = min(budget, 2 * (count - len(results)) + 8)   # grammars rarely miss
+        budget -= n
+        drawn  += n
+        for un in _generate_batch(style, length, base, platform, n):
+            results[un] = None
+            if len(results) == count:
+                break
+    _count('generate_candidates', drawn, style=style)
+    _count('generate_accepted', len(results), style=style)
+    _observe('generate_candidates_per_request', drawn, COUNT_BUCKETS)
     return list(results)
 
 
 # ── Availability (Roblox only) ────────────────────────────────────────────────
 
-ROBLOX_API = 'https://users.roblox.com/v1/usernames/users'
+ROBLOX_API          = os.environ.get('ROBLOX_API', 'https://users.roblox.com/v1/usernames/users')
+ROBLOX_BATCH        = 100   # names per request, the API maximum
+ROBLOX_TIMEOUT      = 8     # seconds
+WEB_THREADS         = int(os.environ.get('WEB_THREADS', 4))   # gunicorn --threads, or --worker-connections
+ROBLOX_MAX_INFLIGHT = int(os.environ.get('ROBLOX_MAX_INFLIGHT', min(WEB_THREADS * 2, 64)))
+AVAIL_TAKEN_TTL     = int(os.environ.get('AVAIL_TAKEN_TTL', 6 * 3600))   # taken names rarely free up
+AVAIL_FREE_TTL      = int(os.environ.get('AVAIL_FREE_TTL', 120))         # free ones can go any second
+AVAIL_CACHE_SLOTS   = int(os.environ.get('AVAIL_CACHE_SLOTS', 1 << 18))
+
+# One keep-alive pool per worker; batches from all request threads share it
+# and the executor bounds how many are in flight at once.
+_roblox_session = requests.Session()
+_roblox_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ROBLOX_MAX_INFLIGHT)
+_roblox_session.mount('https://', _roblox_adapter)
+_roblox_session.mount('http://', _roblox_adapter)   # local stubs
+_roblox_pool = ThreadPoolExecutor(ROBLOX_MAX_INFLIGHT, thread_name_prefix='roblox')
+
+# Lowercase username -> (taken, checked_at), shared by all workers.
+_avail_cache   = SharedTable('avail', AVAIL_CACHE_SLOTS, '?d')
+_avail_flight  = SingleFlight()
+_avail_breaker = CircuitBreaker('roblox', ROBLOX_TIMEOUT)
+
+
+def _roblox_batch(batch: list[str]) -> set[str] | None:
+    """Return the lowercase names in `batch` that are taken, or None on error."""
+    if not _avail_breaker.allow():
+        return None   # the Roblox API is down: unknown, without waiting
+    payload = {'usernames': batch, 'excludeBannedUsers': True}
+    t0, ok  = time.perf_counter(), False
+    try:
+        resp = _roblox_session.post(ROBLOX_API, json=payload, timeout=_avail_breaker.timeout())
+        resp.raise_for_status()
+        found = {u['requestedUsername'].lower() for u in resp.json().get('data', [])}
+        ok    = True
+    except requests.RequestException as exc:
+        _count('upstream_errors', upstream='roblox')
+        security_logger.error('ROBLOX_API_ERROR  error=%s', exc)
+        app.logger.error('Roblox API error: %s', exc)
+        return None
+    finally:
+        elapsed = time.perf_counter() - t0
+        _avail_breaker.record(elapsed, ok)
+        _observe('upstream_seconds', elapsed, upstream='roblox')
+    security_logger.info('AVAIL_CHECK  platform=roblox  batch=%d  taken=%d  available=%d',
+                         len(batch), len(found), len(batch) - len(found))
+    return found
+
+
+def _avail_fresh(value: tuple | None, now: float) -> bool:
+    return value is not None and now - value[1] < (AVAIL_TAKEN_TTL if value[0] else AVAIL_FREE_TTL)
+
+
+def _batches_done(batches: list[list[str]]):
+    """Yield ``(batch, found)`` for each Roblox batch as it completes."""
+    if len(batches) == 1:
+        yield batches[0], _roblox_batch(batches[0])
+        return
+    futures = {_roblox_pool.submit(_roblox_batch, batch): batch for batch in batches}
+    for fut in as_completed(futures):
+        yield futures[fut], fut.result()
+
+
+def _roblox_verdicts(usernames: list[str]):
+    """Yield ``{lowercase name: taken}`` dicts as verdicts come in.
+
+    Cache hits come first, then one dict per upstream batch as it lands, then
+    names another request was already looking up. None means "unknown".
+    """
+    # Roblox names are case-insensitive: look each one up once.
+    unique: dict[str, str] = {}
+    for un in usernames:
+        unique.setdefault(un.lower(), un)
+
+    now  = time.time()
+    hits = {}
+    for key in unique:
+        cached = _avail_cache.get(key)
+        if _avail_fresh(cached, now):
+            hits[key] = bool(cached[0])
+    _count('avail_cache_hit', len(hits))
+    if hits:
+        yield hits
+
+    # Names another request is already asking about are waited on, not re-sent.
+    mine, theirs = _avail_flight.claim(k for k in unique if k not in hits)
+    _count('avail_cache_miss', len(mine))
+    _count('avail_cache_coalesced', len(theirs))
+    keys    = list(mine)
+    batches = [[unique[k] for k in keys[i:i + ROBLOX_BATCH]] for i in range(0, len(keys), ROBLOX_BATCH)]
+    settled = set()
+    try:
+        for batch, found in _batches_done(batches):
+            part, now = {}, time.time()
+            for un in batch:
+                key = un.lower()
+                if found is None:
+                    part[key] = None    # failed: answer later, don't cache
+                else:
+                    part[key] = key in found
+                    _avail_cache.put(key, (part[key], now))
+                _avail_flight.settle(key, part[key])
+                settled.add(key)
+            yield part
+    finally:
+        for key in mine.keys() - settled:
+            _avail_flight.settle(key, None)
+
+    if theirs:
+        waiting = {fut: key for key, fut in theirs.items()}
+        part    = dict.fromkeys(theirs)
+        try:
+            for fut in as_completed(waiting, timeout=ROBLOX_TIMEOUT * 2):
+                part[waiting[fut]] = fut.result()
+        except Exception:   # timed out or failed: leave them unknown
+            pass
+        yield part
 
 
 def check_availability(usernames: list[str], platform: str) -> dict:
     if platform != 'roblox':
-        return {'available': usernames, 'taken': [], 'unchecked': True}
+        return {'available': usernames, 'taken': [], 'unchecked': True, 'unknown': 0}
+
+    verdicts: dict[str, bool | None] = {}
+    for part in _roblox_verdicts(usernames):
+        verdicts.update(part)
+
+    # Unknown verdicts count as available so users still see results
+    # rather than a wall of "taken".
+    available = [un for un in usernames if not verdicts.get(un.lower())]
+    taken     = [un for un in usernames if verdicts.get(un.lower())]
+    unknown   = sum(1 for un in usernames if verdicts.get(un.lower()) is None)
+    return {'available': available, 'taken': taken, 'unchecked': False, 'unknown': unknown}
+
+
+def _evict_stale_availability() -> None:
+    now = time.time()
+    _avail_cache.sweep(lambda value, touched: not _avail_fresh(value, now))
+
+
+_every(300, _evict_stale_availability)
+
+
+# ── Target-available mode (Roblox only) ───────────────────────────────────────
+
+# Opt-in with "target_available": rather than `count` names of which some come
+# back taken, generate enough extra candidates to expect `count` free ones from
+# one Roblox batch, then top up using what that round showed. A round checks
+# at most ROBLOX_BATCH names, so a request makes at most TARGET_MAX_ROUNDS
+# upstream calls. Taken-rates are decayed (taken, checked) counts per style
+# and per style/length, fed by every Roblox availability result.
+
+TARGET_MAX_ROUNDS   = 3
+TARGET_MARGIN       = 1.25   # candidates beyond the expected need
+TARGET_PRIOR        = 0.3    # taken-rate assumed before anything is seen
+TARGET_PRIOR_WEIGHT = 20     # names' worth of evidence a prior counts for
+TAKEN_RATE_HALFLIFE = 900    # seconds
+
+_ROUND_BUCKETS = tuple(range(1, TARGET_MAX_ROUNDS + 1))
+
+# Key -> (taken, checked, updated), shared by all workers.
+_taken_rates = SharedTable('takenrate', 1 << 12, 'ddd')
+
+
+def _decayed(value: tuple | None, now: float) -> tuple[float, float]:
+    if value is None:
+        return 0.0, 0.0
+    k = 0.5 ** ((now - value[2]) / TAKEN_RATE_HALFLIFE)
+    return value[0] * k, value[1] * k
+
+
+def _note_taken(style: str, length: int, taken: int, checked: int) -> None:
+    """Fold one Roblox availability result into the taken-rate estimates."""
+    if not checked:
+        return
+    now = time.time()
+
+    def fold(old):
+        t, n = _decayed(old, now)
+        return (t + taken, n + checked, now), None
+    _taken_rates.update(style, fold)
+    _taken_rates.update(f'{style}/{length}', fold)
+
+
+def _taken_rate(style: str, length: int) -> float:
+    """The style/length estimate, shrunk toward the style's, shrunk toward the prior."""
+    now  = time.time()
+    t, n = _decayed(_taken_rates.get(style), now)
+    rate = (t + TARGET_PRIOR * TARGET_PRIOR_WEIGHT) / (n + TARGET_PRIOR_WEIGHT)
+    t, n = _decayed(_taken_rates.get(f'{style}/{length}'), now)
+    return (t + rate * TARGET_PRIOR_WEIGHT) / (n + TARGET_PRIOR_WEIGHT)
+
+
+def _available_rounds(style: str, length: int, base: str | None, count: int):
+    """Yield ``(available, taken)`` per round until `count` names are free.
+
+    Names without a verdict count as available, as in check_availability,
+    but end the top-ups: the upstream is failing and more calls won't help.
+    """
+    found, seen = 0, set()
+    for rounds in range(1, TARGET_MAX_ROUNDS + 1):
+        rate  = _taken_rate(style, length)
+        want  = min(ROBLOX_BATCH, math.ceil((count - found) / max(1 - rate, 0.05) * TARGET_MARGIN))
+        names = [un for un in _offload(generate_usernames, style, length, 'roblox', base, want)
+                 if un.lower() not in seen]
+        if not names:
+            break   # the grammar has nothing new to offer
+        seen.update(un.lower() for un in names)
+
+        verdicts: dict[str, bool | None] = {}
+        for part in _roblox_verdicts(names):
+            verdicts.update(part)
+        taken = [un for un in names if verdicts.get(un.lower())]
+        free  = [un for un in names if not verdicts.get(un.lower())][:count - found]
+        known = sum(1 for un in names if verdicts.get(un.lower()) is not None)
+        _note_taken(style, length, len(taken), known)
+
+        found += len(free)
+        yield free, taken
+        if found >= count or known < len(names):
+            break
+    _count('target_requests')
+    _observe('target_rounds', rounds, _ROUND_BUCKETS)
+    if found < count:
+        _count('target_short')
+
+
+# ── Reservoir ─────────────────────────────────────────────────────────────────
+
+# A background refiller keeps a queue of pre-generated, pre-checked names for
+# the hottest (platform, style, length) combinations seen in base-less
+# /generate requests, so most of them are answered without generation or a
+# Roblox call. Names older than RESERVOIR_MAX_AGE are dropped rather than
+# served, and every name handed out is recorded host-wide so no worker's
+# reservoir ever hands the same one out twice.
+
+RESERVOIR_ENABLED  = os.environ.get('RESERVOIR', '1').lower() not in ('0', 'false', 'no')
+RESERVOIR_SIZE     = int(os.environ.get('RESERVOIR_SIZE', 200))      # names per combination
+RESERVOIR_HOT      = int(os.environ.get('RESERVOIR_HOT', 8))         # combinations kept warm
+RESERVOIR_MAX_AGE  = int(os.environ.get('RESERVOIR_MAX_AGE', 120))   # seconds
+RESERVOIR_MIN_RATE = float(os.environ.get('RESERVOIR_MIN_RATE', 0.2))  # requests/s before a combination is kept warm
+RESERVOIR_INTERVAL = 5
+
+_reservoir: dict[tuple, deque] = {}   # combination -> deque of (name, checked_at)
+_reservoir_lock = threading.Lock()
+_request_mix    = Counter()           # decayed request counts per combination
+_handed_out     = SharedTable('handed', 1 << 16, 'd')
+
+
+def _note_request(platform: str, style: str, length: int, base: str | None) -> None:
+    if base is None and style != 'custom':
+        with _reservoir_lock:
+            _request_mix[(platform, style, length)] += 1
+
+
+def _drop_stale(pool: deque, now: float) -> None:
+    stale = 0
+    while pool and now - pool[0][1] > RESERVOIR_MAX_AGE:
+        pool.popleft()
+        stale += 1
+    _count('reservoir_stale', stale)
+
+
+def _take_reserved(platform: str, style: str, length: int, count: int,
+                   partial: bool = False) -> list[str] | None:
+    """Pop `count` reserved names, or None to fall back to the live path.
+
+    With `partial`, a reservoir holding fewer than `count` hands out what
+    it has and the caller generates the rest.
+    """
+    with _reservoir_lock:
+        pool = _reservoir.get((platform, style, length))
+        if pool is not None:
+            _drop_stale(pool, time.time())
+            if partial:
+                count = min(count, len(pool))
+        if pool is None or not count or len(pool) < count:
+            _count('reservoir_miss')
+            return None
+        taken = [pool.popleft() for _ in range(count)]
+    now     = time.time()
+    names   = [un for un, _ in taken]
+    claimed = [_handed_out.update(un.lower(), lambda old: ((now,), old is None)) for un in names]
+    if not all(claimed):
+        # Another worker's reservoir got there first for some of them: the
+        # rest were never handed out, so they go back for the next request.
+        unused = [item for item, ok in zip(taken, claimed) if ok]
+        for un, _ in unused:
+            _handed_out.delete(un.lower())
+        with _reservoir_lock:
+            pool.extendleft(reversed(unused))   # oldest stay at the front
+        _count('reservoir_miss')
+        return None
+    _count('reservoir_hit')
+    return names
+
+
+def _refill_one(key: tuple) -> None:
+    platform, style, length = key
+    with _reservoir_lock:
+        pool = _reservoir.setdefault(key, deque())
+        _drop_stale(pool, time.time())
+        need = RESERVOIR_SIZE - len(pool)
+        have = {un.lower() for un, _ in pool}
+    if need <= 0:
+        return
+
+    names = _offload(generate_usernames, style, length, platform, None, need)
+    if PLATFORMS[platform]['check']:
+        verdicts: dict[str, bool | None] = {}
+        for part in _roblox_verdicts(names):
+            verdicts.update(part)
+        _note_taken(style, length, sum(1 for v in verdicts.values() if v),
+                    sum(1 for v in verdicts.values() if v is not None))
+        names = [un for un in names if verdicts.get(un.lower()) is False]   # confirmed free only
+
+    now   = time.time()
+    fresh = [(un, now) for un in names
+             if un.lower() not in have and _handed_out.get(un.lower()) is None]
+    with _reservoir_lock:
+        pool.extend(fresh)
+
+
+def _refill_reservoirs() -> None:
+    # Counts halve every interval, so a steady r requests/s settles at about
+    # r * 2 * RESERVOIR_INTERVAL. A combination asked for once in a while
+    # stays below that and costs no generation or Roblox calls.
+    floor = RESERVOIR_MIN_RATE * 2 * RESERVOIR_INTERVAL
+    with _reservoir_lock:
+        hot = [key for key, n in _request_mix.most_common(RESERVOIR_HOT) if n >= floor]
+        for key in list(_request_mix):
+            _request_mix[key] /= 2   # recent traffic counts most
+            if _request_mix[key] < 0.1:
+                del _request_mix[key]
+        for key in list(_reservoir):
+            if key not in hot:
+                del _reservoir[key]
+    for key in hot:
+        _refill_one(key)
+
+
+def _reservoir_stats() -> dict:
+    now = time.time()
+    with _reservoir_lock:
+        fill = {'/'.join(map(str, key)): {'names': len(pool),
+                                          'oldest_s': round(now - pool[0][1], 1) if pool else 0}
+                for key, pool in _reservoir.items()}
+    return {'fill': fill, **{k: _counter(f'reservoir_{k}') for k in ('hit', 'miss', 'stale')}}
+
+
+def _evict_handed_out() -> None:
+    cutoff = time.time() - 3600
+    _handed_out.sweep(lambda value, touched: value[0] < cutoff)
+
+
+if RESERVOIR_ENABLED:
+    _every(RESERVOIR_INTERVAL, _refill_reservoirs)
+    _every(600, _evict_handed_out)
+
+
+# ── Bulk jobs ─────────────────────────────────────────────────────────────────
+
+# Jobs run on a small per-worker executor, never on a request thread. Their
+# state lives on disk under JOB_DIR so any worker can answer a poll: a
+# meta.json rewritten atomically as the job progresses, and a results file
+# of "<flag>\t<name>" lines (a = available, t = taken, u = unchecked) that
+# clients page through by byte offset.
+
+JOB_DIR         = os.environ.get('JOB_DIR', os.path.join(SHARED_STATE_DIR, 'spacegen-jobs'))
+JOB_MAX_COUNT   = int(os.environ.get('JOB_MAX_COUNT', 20_000))
+JOB_WORKERS     = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE       = int(os.environ.get('JOB_QUEUE', 8))     # waiting jobs per worker
+JOB_TTL         = int(os.environ.get('JOB_TTL', 24 * 3600))
+JOB_STORE_BYTES = int(os.environ.get('JOB_STORE_BYTES', 256 * 1024 * 1024))
+JOB_PAGE_MAX    = 1000
+JOB_CHUNK       = 1000   # names generated, checked and written per progress update
+
+_JOB_ID    = re.compile(r'[A-Za-z0-9_-]{16}')
+_JOB_FLAGS = {'a': 'available', 't': 'taken', 'u': 'unchecked'}
+
+os.makedirs(JOB_DIR, exist_ok=True)
+_job_pool  = ThreadPoolExecutor(JOB_WORKERS, thread_name_prefix='job')
+_job_slots = threading.BoundedSemaphore(JOB_WORKERS + JOB_QUEUE)
+
+
+def _job_file(job_id: str, name: str) -> str:
+    return os.path.join(JOB_DIR, job_id, name)
+
+
+def _read_job(job_id: str) -> dict | None:
+    if not _JOB_ID.fullmatch(job_id):
+        return None
+    try:
+        with open(_job_file(job_id, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    available, taken = [], []
-    for i in range(0, len(usernames), 100):
-        batch   = usernames[i:i + 100]
-        payload = {'usernames': batch, 'excludeBannedUsers': True}
+
+def _write_job(meta: dict) -> None:
+    meta['updated'] = time.time()
+    tmp = _job_file(meta['id'], f'meta.json.{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, _job_file(meta['id'], 'meta.json'))
+
+
+def _job_store_bytes() -> int:
+    total = 0
+    for root, _, files in os.walk(JOB_DIR):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _job_names(p: dict):
+    """Yield a job's names JOB_CHUNK at a time, none of them twice."""
+    style, length, platform, base, count = p['style'], p['length'], p['platform'], p['base'], p['count']
+    g = _grammar(style, length, base, platform)
+    if 0 < g.size < min(count * GEN_ENUM_FACTOR, GEN_ENUM_LIMIT):
+        # Listed once per job, bypassing _enumerate's cache: a list this size
+        # would otherwise stay pinned in the worker after the job is done.
+        names = _offload(_enumerate.__wrapped__, style, length, base, platform)
+        names = random.sample(names, min(count, len(names)))
+        for i in range(0, len(names), JOB_CHUNK):
+            yield names[i:i + JOB_CHUNK]
+        return
+    seen: set[str] = set()
+    while len(seen) < count:
+        batch = _offload(generate_usernames, style, length, platform, base, min(JOB_CHUNK, count - len(seen)))
+        fresh = [un for un in batch if un not in seen]
+        if not fresh:
+            return   # the style has run out of distinct names
+        seen.update(fresh)
+        yield fresh
+
+
+def _run_job(meta: dict) -> None:
+    p = meta['params']
+    try:
+        meta['status'] = 'running'
+        _write_job(meta)
+
+        check = PLATFORMS[p['platform']]['check']
+        with open(_job_file(meta['id'], 'results'), 'a', encoding='utf-8') as out:
+            for part in _job_names(p):
+                if check:
+                    # One Roblox batch at a time, run on this thread: a single
+                    # batch never goes through _roblox_pool, so interactive
+                    # checks never queue behind a job's.
+                    verdicts: dict[str, bool | None] = {}
+                    for j in range(0, len(part), ROBLOX_BATCH):
+                        for v in _roblox_verdicts(part[j:j + ROBLOX_BATCH]):
+                            verdicts.update(v)
+                    flags = ['t' if verdicts.get(un.lower()) else 'a' for un in part]
+                else:
+                    flags = ['u'] * len(part)
+                out.write(''.join(f'{f}\t{un}\n' for f, un in zip(flags, part)))
+                out.flush()
+                meta['done']  += len(part)
+                meta['taken'] += flags.count('t')
+                _write_job(meta)
+
+        meta['status'], meta['total'] = 'done', meta['done']   # short if the style ran out
+        security_logger.info('JOB_DONE  id=%s  generated=%d  taken=%d  seconds=%.1f',
+                             meta['id'], meta['total'], meta['taken'], time.time() - meta['created'])
+    except Exception as exc:
+        meta['status'], meta['error'] = 'failed', str(exc)
+        app.logger.exception('Job %s failed', meta['id'])
+    finally:
+        _write_job(meta)
+        _job_slots.release()
+
+
+def _submit_job(params: dict, ip: str) -> dict | None:
+    """Queue a job; None when this worker's queue or the store is full."""
+    if _job_store_bytes() >= JOB_STORE_BYTES or not _job_slots.acquire(blocking=False):
+        return None
+    try:
+        job_id = secrets.token_urlsafe(12)
+        os.makedirs(os.path.join(JOB_DIR, job_id))
+        meta = {'id': job_id, 'status': 'queued', 'params': params, 'total': params['count'],
+                'done': 0, 'taken': 0, 'created': time.time()}
+        _write_job(meta)
+        security_logger.info('JOB_SUBMITTED  ip=%s  id=%s  platform=%s  style=%s  count=%d',
+                             ip, job_id, params['platform'], params['style'], params['count'])
+        snapshot = dict(meta)
+        _job_pool.submit(_run_job, meta)
+    except BaseException:
+        _job_slots.release()   # _run_job never got it, so nothing else will
+        raise
+    return snapshot
+
+
+def _job_page(job_id: str, cursor: int, limit: int) -> tuple[list[dict], int]:
+    """Read up to `limit` results starting at byte offset `cursor`.
+
+    ValueError if `cursor` is not the start of a line, i.e. not a cursor
+    this function returned.
+    """
+    items = []
+    try:
+        with open(_job_file(job_id, 'results'), 'rb') as f:
+            if cursor:
+                f.seek(cursor - 1)
+                if f.read(1) != b'\n':
+                    raise ValueError(f'bad cursor {cursor}')
+            f.seek(cursor)
+            for line in f:
+                if not line.endswith(b'\n') or len(items) == limit:
+                    break   # partial line still being written, or page full
+                flag, name = line.decode('utf-8').rstrip('\n').split('\t', 1)
+                items.append({'name': name, 'status': _JOB_FLAGS[flag]})
+                cursor += len(line)
+    except FileNotFoundError:
+        pass
+    return items, cursor
+
+
+def _evict_expired_jobs() -> None:
+    cutoff = time.time() - JOB_TTL
+    for job_id in os.listdir(JOB_DIR):
+        path = os.path.join(JOB_DIR, job_id)
+        meta = _read_job(job_id)
         try:
-            resp = requests.post(ROBLOX_API, json=payload, timeout=8)
-            resp.raise_for_status()
-            found = {u['requestedUsername'].lower() for u in resp.json().get('data', [])}
-            for un in batch:
-                (taken if un.lower() in found else available).append(un)
-            security_logger.info('AVAIL_CHECK  platform=roblox  batch=%d  taken=%d  available=%d',
-                                 len(batch),
-                                 sum(1 for u in batch if u.lower() in found),
-                                 sum(1 for u in batch if u.lower() not in found))
-        except requests.RequestException as exc:
-            security_logger.error('ROBLOX_API_ERROR  error=%s', exc)
-            app.logger.error('Roblox API error: %s', exc)
-            # Mark as unchecked rather than taken so users still see results
-            available.extend(batch)
+            # No readable meta.json may just mean _submit_job hasn't written it yet.
+            updated = os.path.getmtime(path) if meta is None else meta['updated']
+        except OSError:
+            continue   # already gone
+        if updated < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+_every(600, _evict_expired_jobs)
+
+
+# ── Index page ────────────────────────────────────────────────────────────────
+
+# The page never changes while the process runs, so it is rendered once at
+# startup and kept in every content coding it can be served in. With
+# SPLIT_ASSETS the inline CSS and JS move to fingerprinted files browsers may
+# cache for a year; the page itself is revalidated against its ETag.
+
+SPLIT_ASSETS  = os.environ.get('SPLIT_ASSETS', '1').lower() not in ('0', 'false', 'no')
+ASSET_MAX_AGE = 365 * 24 * 3600
+_MIN_COMPRESS = 256   # bytes; smaller bodies are only served plain
+
+
+class _Asset(NamedTuple):
+    mimetype: str
+    digest:   str                # of the identity body; ETags add the coding
+    bodies:   dict[str, bytes]   # content coding -> body
+    cache:    str                # Cache-Control
+
+
+def _make_asset(text: str, mimetype: str, cache: str) -> _Asset:
+    raw    = text.encode('utf-8')
+    bodies = {'identity': raw}
+    if len(raw) >= _MIN_COMPRESS:
+        if brotli is not None:
+            bodies['br'] = brotli.compress(raw, quality=11)
+        bodies['gzip'] = gzip.compress(raw, 9, mtime=0)
+    return _Asset(mimetype, hashlib.sha256(raw).hexdigest()[:20], bodies, cache)
+
+
+_assets: dict[str, _Asset] = {}   # fingerprinted file name -> asset
+_index:  _Asset | None     = None
+
+_SPLITS = (
+    ('style',  'css', 'text/css',        '<link rel="stylesheet" href="/assets/{}">'),
+    ('script', 'js',  'text/javascript', '<script src="/assets/{}"></script>'),
+)
 
-    return {'available': available, 'taken': taken, 'unchecked': False}
+
+def _prerender_index() -> None:
+    global _index
+    with app.app_context():
+        html = render_template_string(HTML_TEMPLATE)
+    if SPLIT_ASSETS:
+        immutable = f'public, max-age={ASSET_MAX_AGE}, immutable'
+        for tag, ext, mimetype, ref in _SPLITS:
+            start, end = html.index(f'<{tag}>'), html.index(f'</{tag}>')
+            found = _make_asset(html[start + len(tag) + 2:end], mimetype, immutable)
+            name  = f'app.{found.digest[:12]}.{ext}'
+            _assets[name] = found
+            html = html[:start] + ref.format(name) + html[end + len(tag) + 3:]
+    _index = _make_asset(html, 'text/html', 'no-cache')
+
+
+def _send_asset(found: _Asset) -> Response:
+    """Serve `found` in the best coding the client accepts, or a 304."""
+    accepted = request.accept_encodings
+    coding   = next((c for c in found.bodies if c != 'identity' and accepted[c]), 'identity')
+    etag     = found.digest if coding == 'identity' else f'{found.digest}-{coding}'
+    headers  = {'ETag': f'"{etag}"', 'Cache-Control': found.cache, 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    resp = Response(found.bodies[coding], mimetype=found.mimetype, headers=headers)
+    if coding != 'identity':
+        resp.headers['Content-Encoding'] = coding
+    return resp
+
+
+# ── Request timing and profiling ──────────────────────────────────────────────
+
+# Every response gets a Server-Timing header with the _timed stages that ran
+# and the total, so browser devtools show where a request's time went
+# (streamed responses only carry the stages before the first byte).
+#
+# With PROFILE_REQUESTS=1 and PROFILE_TOKEN set, a request carrying the header
+# "X-Profile: <token>" runs under cProfile and its stats are written to
+# LOG_DIR/profiles (read them with `python -m pstats` or snakeviz). Only this
+# thread is profiled: in async mode the generation handed to _offload is not.
+# Without both settings the middleware is never installed, so it costs
+# nothing.
+
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+PROFILE_TOKEN    = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR      = os.path.join(LOG_DIR, 'profiles')
+PROFILE_KEEP     = int(os.environ.get('PROFILE_KEEP', 50))   # newest files kept
+
+
+@app.before_request
+def _start_timing():
+    if SERVER_TIMING:
+        g.started = time.perf_counter()
+
+
+@app.after_request
+def add_server_timing(response):
+    if SERVER_TIMING and 'started' in g:
+        parts = [f'{stage};dur={sec * 1e3:.2f}' for stage, sec in g.get('timings', {}).items()]
+        parts.append(f'total;dur={(time.perf_counter() - g.started) * 1e3:.2f}')
+        response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+
+def _write_profile(prof: cProfile.Profile, environ: dict, seconds: float) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = environ.get('PATH_INFO', '/').strip('/').replace('/', '-') or 'index'
+    path  = os.path.join(PROFILE_DIR, f'{time.strftime("%Y%m%dT%H%M%S")}-{route}-{os.getpid()}.prof')
+    prof.dump_stats(path)
+    security_logger.info('PROFILE_WRITTEN  path=%s  seconds=%.3f', path, seconds)
+    for old in sorted(glob.glob(os.path.join(PROFILE_DIR, '*.prof')), key=os.path.getmtime)[:-PROFILE_KEEP]:
+        with suppress(OSError):
+            os.remove(old)
+
+
+def _profiled(wsgi_app):
+    """WSGI middleware profiling requests that present the profile token."""
+    key = PROFILE_TOKEN.encode()
+
+    def middleware(environ, start_response):
+        if not secrets.compare_digest(environ.get('HTTP_X_PROFILE', '').encode('latin-1'), key):
+            return wsgi_app(environ, start_response)
+        prof, t0 = cProfile.Profile(), time.perf_counter()
+        body = prof.runcall(wsgi_app, environ, start_response)
+
+        def chunks():   # streamed bodies do their work while being iterated
+            it = iter(body)
+            while True:
+                chunk = prof.runcall(next, it, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+        def finish():
+            with suppress(Exception):
+                _write_profile(prof, environ, time.perf_counter() - t0)
+        return ClosingIterator(chunks(), [getattr(body, 'close', lambda: None), finish])
+    return middleware
+
+
+if PROFILE_REQUESTS and PROFILE_TOKEN:
+    app.wsgi_app = _profiled(app.wsgi_app)
+elif PROFILE_REQUESTS:
+    app.logger.warning('PROFILE_REQUESTS is set but PROFILE_TOKEN is empty: profiling stays off')
 
 
 # ── Routes ────────────────────────────────────────────────────────────────────
 
+# Every request records how many of its worker's WEB_THREADS were busy when
+# it started (itself included; in async mode, how many of its
+# --worker-connections were in use). Requests that take the last free thread mean
+# the worker is saturated and anything arriving after them queues. A thread
+# counts as busy until the server closes the response body, so streamed
+# responses hold theirs for as long as they stream.
+BUSY_BUCKETS = (tuple(range(1, WEB_THREADS + 1)) if WEB_THREADS <= 32 else
+                tuple(sorted({*(2 ** i for i in range(WEB_THREADS.bit_length())), WEB_THREADS})))
+_busy_lock   = threading.Lock()
+_busy        = 0
+
+
+def _leave_request() -> None:
+    global _busy
+    with _busy_lock:
+        _busy -= 1
+
+
+def _track_busy(wsgi_app):
+    def wrapper(environ, start_response):
+        global _busy
+        with _busy_lock:
+            _busy += 1
+            busy = _busy
+        _observe('busy_threads', busy, BUSY_BUCKETS)
+        if busy >= WEB_THREADS:
+            _count('saturated_requests')
+        try:
+            body = wsgi_app(environ, start_response)
+        except BaseException:
+            _leave_request()
+            raise
+        return ClosingIterator(body, _leave_request)
+    return wrapper
+
+
+app.wsgi_app = _track_busy(app.wsgi_app)
+
+
 @app.route('/', methods=['GET'])
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return _send_asset(_index)
+
+
+@app.route('/assets/<name>', methods=['GET'])
+def asset(name):
+    found = _assets.get(name)
+    if found is None:
+        return jsonify({'error': 'Not found'}), 404
+    return _send_asset(found)
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check for Render."""
-    return jsonify({'status': 'ok'}), 200
+    return jsonify({
+        'status':    'ok',
+        'vpn_cache':   {k: _counter(f'vpn_cache_{k}') for k in ('hit', 'miss', 'coalesced')},
+        'avail_cache': {k: _counter(f'avail_cache_{k}') for k in ('hit', 'miss', 'coalesced')},
+        'reservoir':   _reservoir_stats(),
+        'reputation':  {'intervals': len(_reputation),
+                        **{k: _counter(f'reputation_{k}') for k in (*_REP_CATEGORIES, 'unknown')}},
+        'breakers':    {b.name: b.snapshot() for b in (_vpn_breaker, _avail_breaker)},   # this worker's
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of every worker's counters and histograms."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(_prometheus_text(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/check-ip', methods=['GET'])
 def check_ip():
-    ip  = _ip()
-    vpn = _is_vpn(ip)
+    ip    = _ip()
+    state = _vpn_state(ip) if _VPN_CHECK_ENABLED else _VPN_CLEAN
+    vpn   = state == _VPN_FLAGGED
     if vpn:
         security_logger.warning('VISIT  ip=%s  vpn=true', ip)
     else:
         security_logger.info('VISIT  ip=%s  vpn=false', ip)
-    return jsonify({'vpn': vpn, 'ip': ip})
+    if not (VERDICT_TTL and _VPN_CHECK_ENABLED and state == _VPN_CLEAN):
+        return jsonify({'vpn': vpn, 'ip': ip})
+    token    = _issue_verdict(ip)
+    response = jsonify({'vpn': vpn, 'ip': ip, 'verdict': token})
+    # Always Secure: TLS ends at Render's proxy, so request.is_secure is False here.
+    response.set_cookie(VERDICT_COOKIE, token, max_age=VERDICT_TTL, secure=True,
+                        httponly=True, samesite='Strict')
+    return response
 
 
-@app.route('/generate', methods=['POST'])
-def generate():
-    ip = _ip()
+def _generate_params(ip: str, max_count: int = 50, log_request: bool = True):
+    """Gate and validate a generate request.
 
-    if _is_rate_limited(ip):
-        return jsonify({'error': 'Too many requests. Please slow down.'}), 429
+    Returns ``(params, None)`` or ``(None, error_response)``. Callers that
+    log their own event (jobs: JOB_SUBMITTED) pass ``log_request=False`` so
+    the GENERATE_REQUEST mix only counts interactive requests.
+    """
+    with _timed('rate_limit'):
+        limited = _is_rate_limited(ip)
+    if limited:
+        return None, (jsonify({'error': 'Too many requests. Please slow down.'}), 429)
 
     data = request.get_json(force=True, silent=True)
 
     if data is None:
         security_logger.warning('BAD_REQUEST  ip=%s  reason=invalid_json', ip)
-        return jsonify({'error': 'Invalid JSON'}), 400
+        return None, (jsonify({'error': 'Invalid JSON'}), 400)
 
-    if _is_vpn(ip, log_errors=True):
+    with _timed('vpn_check'):
+        vpn = not _request_verdict(ip) and _is_vpn(ip, log_errors=True)
+    if vpn:
         security_logger.warning('GENERATE_BLOCKED_VPN  ip=%s', ip)
-        return jsonify({'error': 'vpn_detected'}), 403
+        return None, (jsonify({'error': 'vpn_detected'}), 403)
 
     platform = str(data.get('platform', 'roblox')).lower().strip()
     if platform not in VALID_PLATFORMS:
         security_logger.warning('INVALID_INPUT  ip=%s  field=platform  value=%r', ip, platform)
-        return jsonify({'error': 'Invalid platform'}), 400
+        return None, (jsonify({'error': 'Invalid platform'}), 400)
 
     raw_style = str(data.get('style', 'unique')).lower().strip()
     if raw_style not in VALID_STYLES:
         security_logger.warning('INVALID_INPUT  ip=%s  field=style  value=%r', ip, raw_style)
-        return jsonify({'error': 'Invalid style'}), 400
+        return None, (jsonify({'error': 'Invalid style'}), 400)
 
     p = PLATFORMS[platform]
     try:
         length = max(p['min'], min(p['max'], int(data.get('length', 8))))
-        count  = max(1, min(50, int(data.get('count', 10))))
+        count  = max(1, min(max_count, int(data.get('count', 10))))
     except (TypeError, ValueError):
         security_logger.warning('INVALID_INPUT  ip=%s  reason=non_numeric', ip)
-        return jsonify({'error': 'length and count must be integers'}), 400
+        return None, (jsonify({'error': 'length and count must be integers'}), 400)
 
     raw_base = str(data.get('base') or '').strip()
     base     = raw_base or None
 
     if base and (len(base) > 50 or any(c in base for c in '<>"\';&`\\')):
         security_logger.warning('SUSPICIOUS_INPUT  ip=%s  field=base  value=%r', ip, base[:80])
-        return jsonify({'error': 'Invalid base word'}), 400
+        return None, (jsonify({'error': 'Invalid base word'}), 400)
+
+    if log_request:
+        security_logger.info('GENERATE_REQUEST  ip=%s  platform=%s  style=%s  length=%d  count=%d  base=%r',
+                             ip, platform, raw_style, length, count, base)
+    return {'platform': platform, 'style': raw_style, 'length': length,
+            'count': count, 'base': base,
+            'target': bool(data.get('target_available')) and p['check']}, None
 
-    security_logger.info('GENERATE_REQUEST  ip=%s  platform=%s  style=%s  length=%d  count=%d  base=%r',
-                         ip, platform, raw_style, length, count, base)
 
-    usernames  = generate_usernames(raw_style, length, platform, base, count)
-    avail_data = check_availability(usernames, platform)
+@app.route('/generate', methods=['POST'])
+def generate():
+    ip = _ip()
+    params, error = _generate_params(ip)
+    if error:
+        return error
+    platform = params['platform']
+    _note_request(platform, params['style'], params['length'], params['base'])
+
+    reserved = None
+    if RESERVOIR_ENABLED and params['base'] is None:
+        with _timed('reservoir'):
+            reserved = _take_reserved(platform, params['style'], params['length'], params['count'])
+    if reserved is not None:
+        usernames  = reserved
+        avail_data = {'available': reserved, 'taken': [], 'unchecked': not PLATFORMS[platform]['check']}
+    elif params['target']:
+        with _timed('target'):
+            rounds = list(_available_rounds(params['style'], params['length'], params['base'],
+                                            params['count']))
+        usernames  = [un for free, _ in rounds for un in free]
+        avail_data = {'available': usernames, 'taken': [], 'unchecked': False}
+    else:
+        with _timed('generate'):
+            usernames = _offload(generate_usernames, params['style'], params['length'], platform,
+                                 params['base'], params['count'])
+        with _timed('availability'):
+            avail_data = check_availability(usernames, platform)
+        if not avail_data['unchecked']:
+            _note_taken(params['style'], params['length'], len(avail_data['taken']),
+                        len(usernames) - avail_data['unknown'])
 
     security_logger.info('GENERATE_RESULT  ip=%s  platform=%s  generated=%d  available=%d  taken=%d',
                          ip, platform, len(usernames), len(avail_data['available']), len(avail_data['taken']))
 
+    with _timed('serialize'):
+        return jsonify({
+            'generated': usernames,
+            'available': avail_data['available'],
+            'taken':     avail_data['taken'],
+            'unchecked': avail_data.get('unchecked', False),
+            'platform':  platform,
+        })
+
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """Same as /generate, streamed as NDJSON records.
+
+    One ``name`` record per generated name as soon as it exists, then
+    ``availability`` records as each cache lookup or Roblox batch resolves,
+    then a closing ``summary``. Names from the reservoir, already checked,
+    come first with their own ``availability`` record.
+    """
+    ip = _ip()
+    params, error = _generate_params(ip)
+    if error:
+        return error
+    platform = params['platform']
+    _note_request(platform, params['style'], params['length'], params['base'])
+
+    reserved = []
+    if RESERVOIR_ENABLED and params['base'] is None:
+        with _timed('reservoir'):
+            reserved = _take_reserved(platform, params['style'], params['length'], params['count'],
+                                      partial=True) or []
+    rest = params['count'] - len(reserved)
+
+    def records():
+        unchecked = not PLATFORMS[platform]['check']
+        taken     = set()
+        # Reserved names are already checked and free: out they go first.
+        for un in reserved:
+            yield json.dumps({'type': 'name', 'name': un}) + '\n'
+        if reserved and not unchecked:
+            yield json.dumps({
+                'type':      'availability',
+                'available': [un.lower() for un in reserved],
+                'taken':     [],
+            }) + '\n'
+        usernames = list(reserved)
+        if rest and params['target']:
+            # Only names found free are sent, each round as it resolves.
+            for free, _ in _available_rounds(params['style'], params['length'], params['base'], rest):
+                free = [un for un in free if un not in reserved]
+                usernames += free
+                for un in free:
+                    yield json.dumps({'type': 'name', 'name': un}) + '\n'
+                yield json.dumps({
+                    'type':      'availability',
+                    'available': [un.lower() for un in free],
+                    'taken':     [],
+                }) + '\n'
+        elif rest:
+            with _timed('generate'):
+                fresh = _offload(generate_usernames, params['style'], params['length'], platform,
+                                 params['base'], params['count'])
+            fresh = [un for un in fresh if un not in reserved][:rest]
+            usernames += fresh
+            for un in fresh:
+                yield json.dumps({'type': 'name', 'name': un}) + '\n'
+
+            if not unchecked:
+                known = 0   # unknown verdicts (upstream failures) say nothing about the rate
+                for part in _roblox_verdicts(fresh):
+                    taken.update(k for k, v in part.items() if v)
+                    known += sum(1 for v in part.values() if v is not None)
+                    yield json.dumps({
+                        'type':      'availability',
+                        'available': [k for k, v in part.items() if not v],
+                        'taken':     [k for k, v in part.items() if v],
+                    }) + '\n'
+                _note_taken(params['style'], params['length'], len(taken), known)
+
+        n_taken = sum(1 for un in usernames if un.lower() in taken)
+        security_logger.info('GENERATE_RESULT  ip=%s  platform=%s  generated=%d  available=%d  taken=%d',
+                             ip, platform, len(usernames), len(usernames) - n_taken, n_taken)
+        yield json.dumps({
+            'type':      'summary',
+            'generated': len(usernames),
+            'available': len(usernames) - n_taken,
+            'taken':     n_taken,
+            'unchecked': unchecked,
+            'platform':  platform,
+        }) + '\n'
+
+    resp = Response(stream_with_context(records()), mimetype='application/x-ndjson')
+    resp.headers['Cache-Control']     = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'   # don't let a proxy hold the stream back
+    return resp
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a bulk generate + availability job of up to JOB_MAX_COUNT names."""
+    ip = _ip()
+    params, error = _generate_params(ip, max_count=JOB_MAX_COUNT, log_request=False)
+    if error:
+        return error
+    meta = _submit_job(params, ip)
+    if meta is None:
+        return jsonify({'error': 'Job queue is full. Please try again later.'}), 503
+    resp = jsonify({'id': meta['id'], 'status': meta['status'], 'total': meta['total']})
+    resp.headers['Location'] = f"/jobs/{meta['id']}"
+    return resp, 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    meta = _read_job(job_id)
+    if meta is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({k: meta.get(k) for k in ('id', 'status', 'total', 'done', 'taken', 'error',
+                                             'created', 'updated', 'params')})
+
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """One page of results; pass `next_cursor` back as `cursor` for the next."""
+    meta = _read_job(job_id)
+    if meta is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    try:
+        cursor = max(0, int(request.args.get('cursor', 0)))
+        limit  = max(1, min(JOB_PAGE_MAX, int(request.args.get('limit', 500))))
+    except ValueError:
+        return jsonify({'error': 'cursor and limit must be integers'}), 400
+
+    try:
+        items, cursor = _job_page(job_id, cursor, limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    finished = meta['status'] in ('done', 'failed')
     return jsonify({
-        'generated': usernames,
-        'available': avail_data['available'],
-        'taken':     avail_data['taken'],
-        'unchecked': avail_data.get('unchecked', False),
-        'platform':  platform,
+        'status':      meta['status'],
+        'items':       items,
+        # Null once a finished job has nothing left; while it runs, poll again.
+        'next_cursor': None if finished and len(items) < limit else cursor,
     })
 
 
+@app.route('/jobs/<job_id>/export', methods=['GET'])
+def job_export(job_id):
+    """Stream every result written so far as NDJSON."""
+    if _read_job(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def records():
+        cursor = 0
+        while True:
+            items, cursor = _job_page(job_id, cursor, JOB_PAGE_MAX)
+            if not items:
+                return
+            yield ''.join(json.dumps(item) + '\n' for item in items)
+
+    resp = Response(records(), mimetype='application/x-ndjson')
+    resp.headers['Content-Disposition'] = f'attachment; filename="{job_id}.ndjson"'
+    return resp
+
+
+def _read_capped(stream, limit: int) -> bytes | None:
+    """The whole of `stream`, or None as soon as it runs past `limit` bytes."""
+    chunks, size = [], 0
+    while chunk := stream.read(min(1 << 16, limit + 1 - size)):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return None
+    return b''.join(chunks)
+
+
+def _body_lines(stream):
+    """Names from a newline-delimited body, read in blocks as it arrives."""
+    tail = b''
+    while block := stream.read(1 << 16):
+        lines = (tail + block).split(b'\n')
+        tail  = lines.pop()[:VALIDATE_LINE_MAX]   # the rest of an over-long line is dropped
+        for line in lines:
+            name = line[:VALIDATE_LINE_MAX].decode('utf-8', 'replace').strip()
+            if name:
+                yield name
+    name = tail.decode('utf-8', 'replace').strip()
+    if name:
+        yield name
+
+
+@app.route('/validate', methods=['POST'])
+def validate():
+    """Check names against platform rules, streamed back as NDJSON.
+
+    The body is either JSON, ``{"names": [...], "platform": "roblox"}``, or
+    one name per line (any other content type), read while results stream.
+    ``platform`` (body or query string) is one platform or ``all``, the
+    default. Each name gets a ``result`` record listing the platforms it
+    passes and the rules it breaks on the others (see REJECT_REASONS); a
+    closing ``summary`` counts valid names per platform and says whether
+    the request went over VALIDATE_MAX_NAMES.
+    """
+    ip = _ip()
+    if _is_rate_limited(ip):
+        return jsonify({'error': 'Too many requests. Please slow down.'}), 429
+
+    if request.is_json:
+        body = _read_capped(request.stream, VALIDATE_MAX_BYTES)   # chunked bodies have no length
+        if body is None:
+            return jsonify({'error': 'Request body too large'}), 413
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        names = data.get('names') if isinstance(data, dict) else None
+        if not isinstance(names, list) or not all(isinstance(un, str) for un in names):
+            security_logger.warning('BAD_REQUEST  ip=%s  reason=invalid_names', ip)
+            return jsonify({'error': 'names must be a list of strings'}), 400
+        platform = data.get('platform') or request.args.get('platform', 'all')
+    else:
+        names    = _body_lines(request.stream)
+        platform = request.args.get('platform', 'all')
+
+    platform = str(platform).lower().strip()
+    if platform != 'all' and platform not in VALID_PLATFORMS:
+        security_logger.warning('INVALID_INPUT  ip=%s  field=platform  value=%r', ip, platform)
+        return jsonify({'error': 'Invalid platform'}), 400
+    platforms = list(PLATFORMS) if platform == 'all' else [platform]
+
+    def records():
+        for chunk in _validation_records(names, platforms):
+            yield chunk
+        summary = json.loads(chunk)
+        _count('validated_names', summary['names'])
+        security_logger.info('VALIDATE  ip=%s  platform=%s  names=%d  truncated=%s',
+                             ip, platform, summary['names'], summary['truncated'])
+
+    resp = Response(stream_with_context(records()), mimetype='application/x-ndjson')
+    resp.headers['Cache-Control']     = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
 # ── HTML Template ─────────────────────────────────────────────────────────────
 
 HTML_TEMPLATE = r'''<!DOCTYPE html>
@@ -502,6 +3046,8 @@ body { font-family: system-ui, sans-serif; background: var(--bg); color: var(--t
   background: var(--surface); color: var(--text); font-size: 0.875rem; width: 100%;
 }
 .field input:focus, .field select:focus { outline: 2px solid var(--accent); outline-offset: -1px; }
+.check { display: flex; align-items: center; gap: 8px; margin-top: 1rem; font-size: 0.875rem; cursor: pointer; }
+.check input { accent-color: var(--accent); width: 16px; height: 16px; }
 
 .btn {
   width: 100%; margin-top: 1.25rem; padding: 10px; border: 1px solid var(--border);
@@ -614,6 +3160,7 @@ body { font-family: system-ui, sans-serif; background: var(--bg); color: var(--t
         <option value="leet">Leet speak (3l33t)</option>
         <option value="themed">Themed (space / fantasy / gaming / nature / cyber)</option>
         <option value="custom">Custom (based on a word)</option>
+        <option value="pronounceable">Pronounceable (word-like)</option>
       </select>
     </div>
 
@@ -622,6 +3169,10 @@ body { font-family: system-ui, sans-serif; background: var(--bg); color: var(--t
       <input type="text" id="base" placeholder="e.g. shadow" maxlength="50">
     </div>
 
+    <label class="check" id="target-wrap">
+      <input type="checkbox" id="target"> Only show available names (checks extra candidates)
+    </label>
+
     <button class="btn" id="gen-btn">Generate and check availability</button>
     <p class="error" id="error-msg" style="display:none" role="alert"></p>
   </div>
@@ -680,6 +3231,7 @@ function applyPlatform() {
 
   document.getElementById('platform-notice').innerHTML =
     '<div class="notice notice-' + type + '">' + text + '</div>';
+  document.getElementById('target-wrap').style.display = meta.check ? 'flex' : 'none';
 
   const btn = document.getElementById('gen-btn');
   if (!btn.disabled) {
@@ -711,6 +3263,7 @@ function savePrefs() {
       count:    document.getElementById('count').value,
       style:    styleEl.value,
       base:     document.getElementById('base').value,
+      target:   document.getElementById('target').checked,
     }));
   } catch (_) { /* storage unavailable */ }
 }
@@ -727,6 +3280,7 @@ function loadPrefs() {
   if (saved.count)  document.getElementById('count').value  = saved.count;
   if (saved.style)  styleEl.value = saved.style;
   if (saved.base)   document.getElementById('base').value   = saved.base;
+  document.getElementById('target').checked = !!saved.target;
 
   applyPlatform();
   if (saved.length) {
@@ -738,7 +3292,7 @@ function loadPrefs() {
   applyStyle();
 }
 
-['length', 'count', 'base'].forEach(id =>
+['length', 'count', 'base', 'target'].forEach(id =>
   document.getElementById(id).addEventListener('input', savePrefs)
 );
 
@@ -758,10 +3312,11 @@ genBtn.addEventListener('click', async () => {
     count:    parseInt(document.getElementById('count').value)  || 10,
     style:    styleEl.value,
     base:     document.getElementById('base').value.trim(),
+    target_available: PLATFORM_META[currentPlatform].check && document.getElementById('target').checked,
   };
 
   try {
-    const resp = await fetch('/generate', {
+    const resp = await fetch('/generate/stream', {
       method:  'POST',
       headers: { 'Content-Type': 'application/json' },
       body:    JSON.stringify(payload),
@@ -780,11 +3335,16 @@ genBtn.addEventListener('click', async () => {
       throw new Error(err.error || ('Server error ' + resp.status));
     }
 
-    const data = await resp.json();
-    if (!data.generated || data.generated.length === 0) {
+    const view = startResults(payload.platform);
+    await readRecords(resp, rec => {
+      if (rec.type === 'name')         view.add(rec.name);
+      if (rec.type === 'availability') view.update(rec);
+      if (rec.type === 'summary')      view.finish(rec);
+    });
+    if (view.count() === 0) {
+      resultsEl.innerHTML = '';
       throw new Error('No usernames could be generated with the current settings. Try a different style or length.');
     }
-    renderResults(data);
   } catch (err) {
     errorMsg.textContent = err.message;
     errorMsg.style.display = 'block';
@@ -795,81 +3355,112 @@ genBtn.addEventListener('click', async () => {
   }
 });
 
+// Feed each newline-delimited JSON record to `onRecord` as it arrives.
+async function readRecords(resp, onRecord) {
+  const decoder = new TextDecoder();
+  let buf = '';
+  const feed = text => {
+    buf += text;
+    let nl;
+    while ((nl = buf.indexOf('\n')) >= 0) {
+      const line = buf.slice(0, nl).trim();
+      buf = buf.slice(nl + 1);
+      if (line) onRecord(JSON.parse(line));
+    }
+  };
+  if (!resp.body) { feed(await resp.text() + '\n'); return; }
+  const reader = resp.body.getReader();
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    feed(decoder.decode(value, { stream: true }));
+  }
+  feed(decoder.decode() + '\n');
+}
+
 // ── Render results ─────────────────────────────────────────────────────────
 function esc(s) {
   return s.replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c]));
 }
 
-function renderResults(data) {
-  const availSet   = new Set((data.available || []).map(s => s.toLowerCase()));
-  const unchecked  = data.unchecked;
-  const total      = data.generated.length;
-  const availCount = (data.available || []).length;
-  const platLabel  = PLATFORM_META[data.platform]?.label || data.platform;
-
-  const rows = data.generated.map(un => {
-    const safeUn  = esc(un);
-    const isAvail = availSet.has(un.toLowerCase());
-    let badge, copy = '';
-
-    if (unchecked) {
-      badge = '<span class="badge badge-unknown">Not checked</span>';
-      copy  = '<button class="copy-btn" data-name="' + safeUn + '">Copy</button>';
-    } else if (isAvail) {
-      badge = '<span class="badge badge-avail">Available</span>';
-      copy  = '<button class="copy-btn" data-name="' + safeUn + '">Copy</button>';
-    } else {
-      badge = '<span class="badge badge-taken">Taken</span>';
-    }
-
-    return '<div class="un-row">'
-      + '<span class="un-name">' + safeUn + '</span>'
-      + '<div class="un-right">' + badge + copy + '</div>'
-      + '</div>';
-  }).join('');
-
-  const metaRight = unchecked
-    ? total + ' generated'
-    : availCount + ' of ' + total + ' available';
+const BADGES = {
+  pending:   '<span class="badge badge-unknown">Checking\u2026</span>',
+  unchecked: '<span class="badge badge-unknown">Not checked</span>',
+  avail:     '<span class="badge badge-avail">Available</span>',
+  taken:     '<span class="badge badge-taken">Taken</span>',
+};
 
-  const footer = unchecked
-    ? '<p class="summary">Availability not checked \u2014 verify manually before use.</p>'
-    : '<p class="summary">' + availCount + ' available \u00b7 ' + (total - availCount) + ' taken</p>';
+function startResults(platform) {
+  const check     = PLATFORM_META[platform]?.check;
+  const platLabel = PLATFORM_META[platform]?.label || platform;
+  const rows      = new Map();   // lowercase name -> row element
 
   resultsEl.innerHTML =
     '<div class="results">'
     + '<div class="results-meta">'
     + '<span>' + esc(styleEl.options[styleEl.selectedIndex].text) + ' \u00b7 ' + esc(platLabel) + '</span>'
-    + '<span>' + metaRight + '</span>'
+    + '<span class="meta-right"><span class="spinner"></span></span>'
     + '</div>'
-    + '<div class="un-list">' + rows + '</div>'
-    + footer
+    + '<div class="un-list"></div>'
+    + '<div class="results-footer"></div>'
     + '</div>';
+  const list = resultsEl.querySelector('.un-list');
 
-  // Event delegation for copy buttons (avoids inline onclick)
-  resultsEl.querySelectorAll('.copy-btn').forEach(btn => {
-    btn.addEventListener('click', () => {
-      const name = btn.dataset.name;
-      navigator.clipboard.writeText(name).then(() => {
-        btn.textContent = 'Copied!';
-        setTimeout(() => btn.textContent = 'Copy', 1500);
-      }).catch(() => {
-        // Fallback for older browsers
-        const ta = document.createElement('textarea');
-        ta.value = name;
-        ta.style.position = 'fixed';
-        ta.style.opacity  = '0';
-        document.body.appendChild(ta);
-        ta.select();
-        document.execCommand('copy');
-        document.body.removeChild(ta);
-        btn.textContent = 'Copied!';
-        setTimeout(() => btn.textContent = 'Copy', 1500);
-      });
-    });
-  });
+  function setState(row, state) {
+    const copy = state === 'taken' ? ''
+      : '<button class="copy-btn" data-name="' + esc(row.dataset.name) + '">Copy</button>';
+    row.querySelector('.un-right').innerHTML = BADGES[state] + (state === 'pending' ? '' : copy);
+  }
+
+  return {
+    count: () => rows.size,
+    add(un) {
+      const row = document.createElement('div');
+      row.className    = 'un-row';
+      row.dataset.name = un;
+      row.innerHTML    = '<span class="un-name">' + esc(un) + '</span><div class="un-right"></div>';
+      setState(row, check ? 'pending' : 'unchecked');
+      rows.set(un.toLowerCase(), row);
+      list.appendChild(row);
+    },
+    update(rec) {
+      (rec.available || []).forEach(k => rows.has(k) && setState(rows.get(k), 'avail'));
+      (rec.taken || []).forEach(k => rows.has(k) && setState(rows.get(k), 'taken'));
+    },
+    finish(sum) {
+      resultsEl.querySelector('.meta-right').textContent = sum.unchecked
+        ? sum.generated + ' generated'
+        : sum.available + ' of ' + sum.generated + ' available';
+      resultsEl.querySelector('.results-footer').innerHTML = sum.unchecked
+        ? '<p class="summary">Availability not checked \u2014 verify manually before use.</p>'
+        : '<p class="summary">' + sum.available + ' available \u00b7 ' + sum.taken + ' taken</p>';
+    },
+  };
 }
 
+// Event delegation for copy buttons (avoids inline onclick)
+resultsEl.addEventListener('click', e => {
+  const btn = e.target.closest('.copy-btn');
+  if (!btn) return;
+  const name = btn.dataset.name;
+  navigator.clipboard.writeText(name).then(() => {
+    btn.textContent = 'Copied!';
+    setTimeout(() => btn.textContent = 'Copy', 1500);
+  }).catch(() => {
+    // Fallback for older browsers
+    const ta = document.createElement('textarea');
+    ta.value = name;
+    ta.style.position = 'fixed';
+    ta.style.opacity  = '0';
+    document.body.appendChild(ta);
+    ta.select();
+    document.execCommand('copy');
+    document.body.removeChild(ta);
+    btn.textContent = 'Copied!';
+    setTimeout(() => btn.textContent = 'Copy', 1500);
+  });
+});
+
 // ── VPN check on page load ─────────────────────────────────────────────────
 (async () => {
   try {
@@ -889,6 +3480,8 @@ loadPrefs();
 </html>
 '''
 
+_prerender_index()
+
 if __name__ == '__main__':
     # Use FLASK_DEBUG env var (Flask 2.3+ style) instead of deprecated FLASK_ENV
     debug = os.environ.get('FLASK_DEBUG', '0') == '1'
@@ -0,0 +1,476 @@
+"""Micro-benchmarks for the hot paths in app.py.
+
+    python bench.py                          # run everything, JSON to stdout
+    python bench.py ratelimit vpn            # run a subset
+    python bench.py --quick                  # smaller sizes, for a fast check
+    python bench.py --out run.json           # also write the results to a file
+    python bench.py --baseline bench_baseline.json --threshold 0.25
+    python bench.py --save-baseline bench_baseline.json
+
+Every benchmark seeds `random` so the same inputs are timed on every run.
+Metric names carry their direction: `*_us` / `*_ms` are lower-is-better,
+`*_per_s` higher-is-better; anything else is context and never compared.
+With --baseline the process exits 1 if any comparable metric is worse than
+the baseline by more than --threshold (a fraction, 0.25 = 25%).
+Baselines are per machine; on shared or throttled hosts record one there
+and widen --threshold rather than comparing against someone else's.
+
+Shared tables are created in a throwaway directory so a benchmark run never
+touches the state of a server running on the same host, and upstream calls
+go to an in-process fake (see fakeapi.py), never to Roblox or ipapi.is.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform as _platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('SHARED_STATE_DIR', tempfile.mkdtemp(prefix='spacegen-bench-'))
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='spacegen-bench-logs-'))
+os.environ.setdefault('DISABLE_VPN_CHECK', '1')
+
+import app  # noqa: E402  (environment must be set first)
+from fakeapi import FakeUpstream  # noqa: E402
+
+SEED  = 1234
+QUICK = False
+
+_upstream: FakeUpstream | None = None
+
+
+def _fake() -> FakeUpstream:
+    """Start the fake upstream once and point app.py at it."""
+    global _upstream
+    if _upstream is None:
+        _upstream     = FakeUpstream().start()
+        app.ROBLOX_API = _upstream.roblox_url
+        app.IPAPI_URL  = _upstream.url + '/'
+    return _upstream
+
+
+def _size(full: int, quick: int) -> int:
+    return quick if QUICK else full
+
+
+def _per_call(fn, n: int) -> float:
+    """Run `fn(i)` for i in range(n) and return microseconds per call."""
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _best_of(fn, repeat: int = 5) -> float:
+    """Smallest wall time of `repeat` runs of `fn()`, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _ips(n: int, first: int) -> list[str]:
+    return [f'{first}.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(n)]
+
+
+def bench_ratelimit() -> dict:
+    n_ips = _size(100_000, 20_000)
+    ips   = _ips(n_ips, 11)
+    cold  = _per_call(lambda i: app._is_rate_limited(ips[i]), n_ips)
+    warm  = _per_call(lambda i: app._is_rate_limited(ips[i]), n_ips)
+    t0 = time.perf_counter()
+    app._evict_idle_rate_keys()
+    sweep = (time.perf_counter() - t0) * 1e3
+    return {'ips': n_ips, 'first_hit_us': round(cold, 2), 'repeat_hit_us': round(warm, 2),
+            'sweep_ms': round(sweep, 1), 'stored_keys': len(app._rate_table)}
+
+
+def bench_vpn() -> dict:
+    """Verdict cache: first lookup goes to the fake ipapi, repeats are hits; then token checks."""
+    _fake()
+    n_ips   = _size(10_000, 2_000)
+    ips     = _ips(n_ips, 23)   # 23/8 is in no reputation list, so every lookup reaches the cache
+    enabled = app._VPN_CHECK_ENABLED
+    app._VPN_CHECK_ENABLED = True
+    try:
+        miss = _per_call(lambda i: app._is_vpn(ips[i]), n_ips)
+        hit  = _per_call(lambda i: app._is_vpn(ips[i]), n_ips)
+    finally:
+        app._VPN_CHECK_ENABLED = enabled
+    tokens = [app._issue_verdict(ip) for ip in ips]
+    token  = _per_call(lambda i: app._verdict_valid(tokens[i], ips[i]), n_ips)
+    return {'ips': n_ips, 'miss_us': round(miss, 2), 'hit_us': round(hit, 2),
+            'token_us': round(token, 2), 'cached': len(app._vpn_cache)}
+
+
+_BASES = {'custom': 'shadow', 'themed': 'space'}
+
+
+def bench_generate() -> dict:
+    """generate_usernames names/sec for every style x platform x length x count."""
+    lengths = (6, 12, 20)
+    counts  = (10, 50)
+    rounds  = _size(20, 5)
+    out     = {}
+    for style in sorted(app.VALID_STYLES):
+        for platform, spec in app.PLATFORMS.items():
+            for length in lengths:
+                length = max(spec['min'], min(spec['max'], length))
+                for count in counts:
+                    base = _BASES.get(style)
+                    random.seed(SEED)
+                    app._enumerate.cache_clear()
+                    made = 0
+                    t0   = time.perf_counter()
+                    for _ in range(rounds):
+                        made += len(app.generate_usernames(style, length, platform, base, count))
+                    elapsed = time.perf_counter() - t0
+                    out[f'{style}/{platform}/len{length}/n{count}_per_s'] = round(made / elapsed)
+    return out
+
+
+def bench_engine() -> dict:
+    """Candidates/sec of the scalar reference vs the batch engine."""
+    n, length = _size(20_000, 2_560), 10
+    out = {}
+    for style in sorted(app.VALID_STYLES):
+        for platform in app.PLATFORMS:
+            base = _BASES.get(style)
+            random.seed(SEED)
+            t0 = time.perf_counter()
+            for _ in range(n):
+                app._generate_one(style, length, base, platform)
+            scalar = n / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for _ in range(n // app.GEN_BATCH):
+                app._generate_batch(style, length, base, platform, app.GEN_BATCH)
+            batch = (n // app.GEN_BATCH * app.GEN_BATCH) / (time.perf_counter() - t0)
+            out[f'{style}/{platform}/scalar_per_s'] = round(scalar)
+            out[f'{style}/{platform}/batch_per_s']  = round(batch)
+    return out
+
+
+def bench_validate() -> dict:
+    """_is_valid and _valid_many names/sec per platform on a mixed corpus."""
+    n = _size(20_000, 4_000)
+    random.seed(SEED)
+    alphabet = app.string.ascii_letters + app.string.digits + '_.-!'
+    corpus   = [''.join(random.choices(alphabet, k=random.randint(1, 34))) for _ in range(n)]
+    out = {}
+    for platform in app.PLATFORMS:
+        scalar = _best_of(lambda: [app._is_valid(u, platform) for u in corpus])
+        bulk   = _best_of(lambda: app._valid_many(corpus, platform))
+        out[f'{platform}/is_valid_per_s']   = round(n / scalar)
+        out[f'{platform}/valid_many_per_s'] = round(n / bulk)
+
+    # POST /validate end to end: a newline-delimited body streamed back as NDJSON.
+    n    = _size(1_000_000, 100_000)
+    body = '\n'.join(itertools.islice(itertools.cycle(corpus), n)).encode()
+    client, limit = app.app.test_client(), app.VALIDATE_MAX_NAMES
+    app.VALIDATE_MAX_NAMES = n
+    try:
+        for platform in ('roblox', 'all'):
+            t0   = time.perf_counter()
+            resp = client.post(f'/validate?platform={platform}', data=body,
+                               headers={'X-Forwarded-For': '10.9.9.9'})
+            for last in resp.iter_encoded():   # drain the stream
+                pass
+            out[f'endpoint/{platform}_names_per_s'] = round(n / (time.perf_counter() - t0))
+            assert json.loads(last.splitlines()[-1])['names'] == n
+    finally:
+        app.VALIDATE_MAX_NAMES = limit
+    return out
+
+
+def bench_availability() -> dict:
+    """check_availability against the fake Roblox endpoint, cold and cached."""
+    fake = _fake()
+    n    = _size(1_000, 300)
+    random.seed(SEED)
+    names = app.generate_usernames('unique', 12, 'roblox', count=n)
+    app._avail_cache.sweep(lambda value, touched: True)
+    calls = fake.calls['roblox']
+    t0   = time.perf_counter()
+    cold = app.check_availability(names, 'roblox')
+    cold_ms = (time.perf_counter() - t0) * 1e3
+    warm_ms = _best_of(lambda: app.check_availability(names, 'roblox')) * 1e3
+    return {'names': len(names), 'upstream_calls': fake.calls['roblox'] - calls,
+            'available': len(cold['available']), 'cold_ms': round(cold_ms, 1),
+            'warm_ms': round(warm_ms, 2)}
+
+
+def bench_index() -> dict:
+    """GET / requests/sec: rendering per request (the old view) vs prerendered."""
+    n      = _size(3000, 500)
+    client = app.app.test_client()
+
+    def rate(headers: dict) -> int:
+        return round(n / _best_of(lambda: [client.get('/', headers=headers) for _ in range(n)], 3))
+
+    view = app.app.view_functions['index']
+    app.app.view_functions['index'] = lambda: app.render_template_string(app.HTML_TEMPLATE)
+    try:
+        out = {'render_per_s': rate({}), 'render_bytes': len(client.get('/').data)}
+    finally:
+        app.app.view_functions['index'] = view
+
+    for coding in app._index.bodies:
+        headers = {'Accept-Encoding': coding}
+        out[f'{coding}_per_s'] = rate(headers)
+        out[f'{coding}_bytes'] = len(client.get('/', headers=headers).data)
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    out['not_modified_per_s'] = rate({'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    return out
+
+
+def bench_breaker() -> dict:
+    """ipapi breaker against a fake outage: calls until it opens, cost of a
+    failing vs a rejected call, and time from the upstream's recovery to closed."""
+    fake    = _fake()
+    n       = _size(2_000, 500)
+    breaker = app.CircuitBreaker('bench', app.VPN_TIMEOUT)
+    saved   = app._vpn_breaker
+    app._vpn_breaker = breaker
+    fake.outage      = (0, float('inf'))   # down from now on
+    try:
+        t0 = time.perf_counter()
+        calls = 0
+        while breaker.state == breaker.CLOSED:
+            app._vpn_fetch('23.0.0.1', False)
+            calls += 1
+        failing  = (time.perf_counter() - t0) / calls * 1e6
+        rejected = _per_call(lambda i: app._vpn_fetch('23.0.0.1', False), n)
+        breaker.cooldown = 0.05
+        fake.outage      = None
+        t0 = time.perf_counter()
+        while breaker.state != breaker.CLOSED:
+            app._vpn_fetch('23.0.0.1', False)
+            time.sleep(0.005)
+        recovery = (time.perf_counter() - t0) * 1e3
+    finally:
+        fake.outage      = None
+        app._vpn_breaker = saved
+    return {'calls_to_open': calls, 'failing_call_us': round(failing, 1),
+            'rejected_call_us': round(rejected, 2), 'recovery_ms': round(recovery, 1)}
+
+
+def bench_reputation() -> dict:
+    """CIDR index: build time and lookups/sec over a million-entry list set."""
+    n = _size(1_000_000, 100_000)
+    random.seed(SEED)
+    directory = tempfile.mkdtemp(prefix='spacegen-bench-rep-')
+    shares    = {'datacenter': 0.6, 'vpn': 0.3, 'tor': 0.05, 'private': 0.05}
+    for category, share in shares.items():
+        with open(os.path.join(directory, f'{category}.txt'), 'w') as f:
+            for _ in range(int(n * share)):
+                if random.random() < 0.8:
+                    f.write(f'{random.randrange(1, 224)}.{random.randrange(256)}.{random.randrange(256)}.'
+                            f'{random.randrange(256)}/{random.choice((24, 28, 32))}\n')
+                else:
+                    f.write(f'2{random.randrange(1 << 12):03x}:{random.randrange(1 << 16):x}:'
+                            f'{random.randrange(1 << 16):x}::/48\n')
+    t0    = time.perf_counter()
+    index = app._load_reputation(directory)
+    build = time.perf_counter() - t0
+    v4    = _ips(100_000, 0)
+    v4    = [f'{random.randrange(1, 224)}.{ip.partition(".")[2]}' for ip in v4]
+    v6    = [f'2{random.randrange(1 << 12):03x}:{random.randrange(1 << 16):x}::1' for _ in range(100_000)]
+    hits  = sum(index.lookup(ip) is not None for ip in v4)
+    return {'entries': index.entries, 'intervals': len(index), 'build_ms': round(build * 1e3),
+            'v4_lookup_us': round(_per_call(lambda i: index.lookup(v4[i]), len(v4)), 3),
+            'v6_lookup_us': round(_per_call(lambda i: index.lookup(v6[i]), len(v6)), 3),
+            'v4_hit_share': round(hits / len(v4), 3)}
+
+
+def bench_words() -> dict:
+    """Word corpus: pack and map times, per-worker heap cost and rank/themed
+    names/sec with 100k-word lists, and the share of names padded with digits."""
+    n = _size(100_000, 20_000)
+    random.seed(SEED)
+    directory = tempfile.mkdtemp(prefix='spacegen-bench-words-')
+    for name in ('prefixes', 'suffixes', 'theme_space', 'theme_cyber'):
+        with open(os.path.join(directory, f'{name}.txt'), 'w') as f:
+            for _ in range(n):
+                f.write(''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=random.randint(3, 10))) + '\n')
+    saved = app._corpus
+    try:
+        t0    = time.perf_counter()
+        app._load_corpus(directory)
+        build = time.perf_counter() - t0
+        tracemalloc.start()
+        t0         = time.perf_counter()
+        app._corpus = app._load_corpus(directory)
+        load       = time.perf_counter() - t0
+        heap       = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        app._grammar.cache_clear()
+        app._enumerate.cache_clear()
+        out = {'words': sum(len(g) for groups in app._corpus.values() for g in groups.values()),
+               'build_ms': round(build * 1e3), 'load_ms': round(load * 1e3, 1),
+               'heap_kb': round(heap / 1024)}
+        for style, base in (('rank', None), ('themed', 'space')):
+            for length in (8, 14, 20):
+                random.seed(SEED)
+                names = []
+                t0 = time.perf_counter()
+                for _ in range(_size(50, 10)):
+                    names += app.generate_usernames(style, length, 'roblox', base, 50)
+                out[f'{style}/len{length}_per_s'] = round(len(names) / (time.perf_counter() - t0))
+                out[f'{style}/len{length}_padded'] = round(
+                    sum(un[-1].isdigit() for un in names) / len(names), 3)
+    finally:
+        app._corpus = saved
+        app._grammar.cache_clear()
+        app._enumerate.cache_clear()
+    return out
+
+
+def bench_metrics() -> dict:
+    """Instrumentation cost as a share of a full /generate request.
+
+    On/off timings of whole requests differ by less than their noise, so
+    this records the metric calls one request makes, replays them `n` times
+    and compares that against the request's own time.
+    """
+    n       = _size(3000, 500)
+    client  = app.app.test_client()
+    payload = {'platform': 'discord', 'style': 'unique', 'length': 8, 'count': 10}
+    limit, reservoir = app.RATE_LIMIT, app.RESERVOIR_ENABLED
+    app.RATE_LIMIT, app.RESERVOIR_ENABLED = 10 ** 9, False
+    random.seed(SEED)
+
+    calls = []
+    count, record = app._count, app._record
+    app._count  = lambda *a, **kw: (calls.append((count, a, kw)), count(*a, **kw))
+    app._record = lambda *a, **kw: (calls.append((record, a, kw)), record(*a, **kw))
+    client.post('/generate', json=payload)
+    app._count, app._record = count, record
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        client.post('/generate', json=payload)
+    request = (time.perf_counter() - t0) / n * 1e6
+
+    def replay(calls) -> float:
+        def run():
+            for _ in range(n):
+                for fn, a, kw in calls:
+                    fn(*a, **kw)
+        return _best_of(run) / n * 1e6
+
+    def noop(*a, **kw):
+        pass
+
+    # Subtract what the replay loop itself costs.
+    replay = max(0.0, replay(calls) - replay([(noop, a, kw) for _, a, kw in calls]))
+
+    app.RATE_LIMIT, app.RESERVOIR_ENABLED = limit, reservoir
+    return {'request_us': round(request, 1), 'metric_calls': len(calls),
+            'metrics_us': round(replay, 2), 'overhead_pct': round(replay / request * 100, 2)}
+
+
+BENCHMARKS = {
+    'ratelimit':    bench_ratelimit,
+    'vpn':          bench_vpn,
+    'generate':     bench_generate,
+    'engine':       bench_engine,
+    'validate':     bench_validate,
+    'availability': bench_availability,
+    'index':        bench_index,
+    'breaker':      bench_breaker,
+    'reputation':   bench_reputation,
+    'words':        bench_words,
+    'metrics':      bench_metrics,
+}
+
+
+def _direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if not comparable."""
+    if metric.endswith('_per_s'):
+        return 1
+    if metric.endswith(('_us', '_ms')):
+        return -1
+    return 0
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Describe every metric that got worse than `baseline` by more than `threshold`."""
+    regressions = []
+    for bench, metrics in results.items():
+        base = baseline.get(bench, {})
+        for metric, value in metrics.items():
+            sign, old = _direction(metric), base.get(metric)
+            if not sign or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            change = (value - old) / old * sign   # negative means worse
+            if change < -threshold:
+                regressions.append(f'{bench}.{metric}: {old} -> {value} ({change:+.0%})')
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    global QUICK
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('names', nargs='*', metavar='benchmark',
+                        help=f'subset to run ({", ".join(BENCHMARKS)})')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs')
+    parser.add_argument('--out', help='also write the JSON results here')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results as a new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown vs baseline as a fraction (default 0.25)')
+    args  = parser.parse_args(argv)
+    QUICK = args.quick
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark {name!r}; choose from {", ".join(BENCHMARKS)}')
+
+    app.security_logger.disabled = True   # keep log I/O out of the timings
+    results = {}
+    for name in args.names or BENCHMARKS:
+        print(f'running {name}...', file=sys.stderr)
+        # Like timeit: collect leftovers from the previous benchmark and keep
+        # the collector out of the timings, so results do not depend on order.
+        gc.collect()
+        gc.disable()
+        try:
+            results[name] = BENCHMARKS[name]()
+        finally:
+            gc.enable()
+
+    report = {
+        'meta': {'python': _platform.python_version(), 'machine': _platform.machine(),
+                 'cpus': os.cpu_count(), 'quick': QUICK, 'seed': SEED,
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('quick') != QUICK:
+            print('warning: baseline was recorded with a different --quick setting', file=sys.stderr)
+        regressions = compare(results, baseline.get('results', {}), args.threshold)
+        for line in regressions:
+            print(f'REGRESSION  {line}', file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'no regressions beyond {args.threshold:.0%}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Offline bulk generation: millions of names to a file or stdout.
+
+    python bulkgen.py --count 1000000 --platform roblox --style rank --out rank.txt
+    python bulkgen.py --count 200000 --style custom --base shadow --workers 4
+    python bulkgen.py --count 50000 --platform roblox --check > checked.tsv
+    python bulkgen.py --count 5000000 --style pronounceable --seed 7 | gzip > names.gz
+
+Work is split into tasks of --chunk names that a process pool runs through
+app.generate_usernames. Every task reseeds the RNG from (--seed, task
+number) and results are taken in task order, so a run's output is the same
+for a given --seed and --chunk whatever the worker count. Names are
+re-checked with app._is_valid before they leave a worker.
+
+Duplicates are dropped globally and case-insensitively with a blocked Bloom
+filter of fixed size (--dedup-bits per requested name): workers hash their
+names, the parent tests one 64-bit word per name. A false positive drops a
+name that was actually new, so output is always unique, just very slightly
+short of the set of names it could have been. Each task's names are written
+as soon as it is its turn and only 2 x --workers tasks are ever in flight,
+so memory stays flat however large --count is.
+
+With --check (Roblox only) names go through app.check_availability in
+batches and come out as "<name>\\t<available|taken>"; unknown verdicts count as
+available, as they do in the app. Progress and the final names/sec go to
+stderr.
+"""
+import argparse
+import hashlib
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('SHARED_STATE_DIR', tempfile.gettempdir())
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='spacegen-bulk-logs-'))
+
+import app  # noqa: E402  (environment must be set first)
+
+CHECK_BATCH = 1000   # names per check_availability call
+STALL_TASKS = 8      # tasks in a row with nothing new: the style is exhausted
+
+
+def _task(seed: int, n: int, params: tuple, words: int) -> tuple[list[str], array, array]:
+    """Generate `n` names and their (word index, bit mask) Bloom keys."""
+    style, length, platform, base = params
+    random.seed(seed)
+    names = [un for un in app.generate_usernames(style, length, platform, base, n)
+             if app._is_valid(un, platform)]
+    index, masks = array('Q'), array('Q')
+    for un in names:
+        h = int.from_bytes(hashlib.blake2b(un.lower().encode(), digest_size=16).digest(), 'little')
+        index.append(h % words)
+        h >>= 64
+        masks.append((1 << (h & 63)) | (1 << (h >> 6 & 63)) | (1 << (h >> 12 & 63)) | (1 << (h >> 18 & 63)))
+    return names, index, masks
+
+
+class _Writer:
+    """Write names as they arrive, through check_availability with --check."""
+
+    def __init__(self, out, platform: str, check: bool):
+        self.out, self.platform, self.check = out, platform, check
+        self.pending: list[str] = []
+        self.taken = 0
+
+    def add(self, names: list[str]) -> None:
+        if not self.check:
+            self.out.write('\n'.join(names) + '\n' if names else '')
+            return
+        self.pending += names
+        while len(self.pending) >= CHECK_BATCH:
+            self._flush(self.pending[:CHECK_BATCH])
+            del self.pending[:CHECK_BATCH]
+
+    def _flush(self, batch: list[str]) -> None:
+        result = app.check_availability(batch, self.platform)
+        taken  = set(result['taken'])
+        self.taken += len(taken)
+        self.out.write(''.join(f'{un}\t{"taken" if un in taken else "available"}\n' for un in batch))
+
+    def close(self) -> None:
+        if self.pending:
+            self._flush(self.pending)
+            self.pending = []
+        self.out.flush()
+
+
+def run(args, out) -> dict:
+    params  = (args.style, args.length, args.platform, args.base)
+    words   = max(1, math.ceil(args.count * args.dedup_bits / 64))
+    seen    = array('Q', bytes(8 * words))
+    writer  = _Writer(out, args.platform, args.check)
+    written = dupes = tasks = idle = 0
+    t0 = last = time.perf_counter()
+
+    # Spawned, not forked: importing app has started threads (metrics flush,
+    # sweeps, the log listener) and a fork taken while one of them holds a
+    # lock would deadlock the child the first time it needs that lock.
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        running: deque = deque()
+        while written < args.count and idle < STALL_TASKS:
+            while len(running) < 2 * args.workers:
+                running.append(pool.submit(_task, args.seed * 1_000_003 + tasks, args.chunk, params, words))
+                tasks += 1
+            names, index, masks = running.popleft().result()
+            fresh = []
+            for un, i, m in zip(names, index, masks):
+                w = seen[i]
+                if w & m == m:
+                    dupes += 1
+                    continue
+                seen[i] = w | m
+                fresh.append(un)
+            fresh    = fresh[:args.count - written]
+            idle     = 0 if fresh else idle + 1
+            written += len(fresh)
+            writer.add(fresh)
+            now = time.perf_counter()
+            if args.progress and now - last >= args.progress:
+                print(f'BULK_PROGRESS  written={written}  names_per_s={written / (now - t0):.0f}',
+                      file=sys.stderr, flush=True)
+                last = now
+        for future in running:
+            future.cancel()
+    writer.close()
+
+    elapsed = time.perf_counter() - t0
+    return {'written': written, 'duplicates': dupes, 'taken': writer.taken, 'tasks': tasks,
+            'workers': args.workers, 'seconds': round(elapsed, 2),
+            'names_per_s': round(written / elapsed), 'exhausted': written < args.count,
+            'dedup_bytes': 8 * words}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, required=True, help='unique names to write')
+    parser.add_argument('--platform', default='roblox', choices=sorted(app.VALID_PLATFORMS))
+    parser.add_argument('--style', default='unique', choices=sorted(app.VALID_STYLES))
+    parser.add_argument('--length', type=int, default=8)
+    parser.add_argument('--base', help='word for the custom and leet styles, theme for themed')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=10_000, help='names per task (default 10000)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--dedup-bits', type=int, default=32,
+                        help='Bloom filter bits per requested name (default 32, ~1 in 3000 new names dropped)')
+    parser.add_argument('--check', action='store_true', help='check Roblox availability in batches')
+    parser.add_argument('--out', help='output file (default stdout)')
+    parser.add_argument('--progress', type=float, default=5, help='seconds between progress lines (0 = off)')
+    args = parser.parse_args(argv)
+    if args.check and args.platform != 'roblox':
+        parser.error('--check is only available for --platform roblox')
+
+    out = open(args.out, 'w', encoding='utf-8', buffering=1 << 20) if args.out else sys.stdout
+    try:
+        report = run(args, out)
+    finally:
+        if args.out:
+            out.close()
+    print('BULK_DONE  ' + '  '.join(f'{k}={v}' for k, v in report.items()), file=sys.stderr)
+    if report['exhausted']:
+        print(f'only {report["written"]} distinct names exist for these settings', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Local stand-ins for the upstream APIs app.py calls.
+
+One HTTP server answers both:
+
+    POST /v1/usernames/users   like users.roblox.com (ROBLOX_API)
+    GET  /?q=<ip>              like api.ipapi.is (IPAPI_URL)
+    GET  /_stats               calls, errors and 429s served so far
+
+Whether a name is taken or an IP is a VPN is a pure function of its hash,
+so results are repeatable across runs and processes. Latency, jitter, a
+share of 500s and a per-API request budget (answered with 429 beyond it)
+are configurable, so app.py can be exercised against a slow or failing
+upstream. --outage UP:DOWN makes both APIs cycle between UP seconds of normal
+service and DOWN seconds of outage, either answering 503 at once or, with
+--outage-mode hang, holding every request open until the client gives up:
+
+    python fakeapi.py --port 8765 --latency 0.3 --error-rate 0.02 --rate-limit 50
+    python fakeapi.py --outage 20:10 --outage-mode hang
+    ROBLOX_API=http://127.0.0.1:8765/v1/usernames/users \\
+    IPAPI_URL=http://127.0.0.1:8765/ gunicorn app:app ...
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _fraction(key: str) -> float:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=4).digest(), 'little') / 2 ** 32
+
+
+class _Budget:
+    """Token bucket allowing `rate` requests per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.rate   = rate
+        self.tokens = rate
+        self.stamp  = time.monotonic()
+        self.lock   = threading.Lock()
+
+    def take(self) -> bool:
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp  = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeUpstream(ThreadingHTTPServer):
+    daemon_threads      = True
+    request_queue_size  = 1024
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, *, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, rate_limit: float = 0.0,
+                 taken_rate: float = 0.3, vpn_rate: float = 0.05,
+                 outage: tuple[float, float] | None = None, outage_mode: str = 'error'):
+        super().__init__((host, port), _Handler)
+        self.latency     = latency
+        self.jitter      = jitter
+        self.error_rate  = error_rate
+        self.taken_rate  = taken_rate
+        self.vpn_rate    = vpn_rate
+        self.outage      = outage
+        self.outage_mode = outage_mode
+        self.started     = time.monotonic()
+        self.budgets     = {'roblox': _Budget(rate_limit), 'ipapi': _Budget(rate_limit)}
+        self.calls       = {'roblox': 0, 'ipapi': 0}
+        self.errors      = {'roblox': 0, 'ipapi': 0}
+        self.throttled   = {'roblox': 0, 'ipapi': 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def roblox_url(self) -> str:
+        return self.url + '/v1/usernames/users'
+
+    def start(self) -> 'FakeUpstream':
+        threading.Thread(target=self.serve_forever, name='fake-upstream', daemon=True).start()
+        return self
+
+    def down(self) -> bool:
+        """True while inside an outage window."""
+        if not self.outage:
+            return False
+        up, down = self.outage
+        return (time.monotonic() - self.started) % (up + down) >= up
+
+    def stats(self) -> dict:
+        return {'calls': self.calls, 'errors': self.errors, 'throttled': self.throttled, 'down': self.down()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, like the real APIs
+    server: FakeUpstream
+
+    def _reply(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _admit(self, api: str) -> bool:
+        """Apply the budget, latency and error knobs; False if already answered."""
+        srv = self.server
+        srv.calls[api] += 1
+        if not srv.budgets[api].take():
+            srv.throttled[api] += 1
+            self._reply(429, {'errors': [{'code': 0, 'message': 'Too many requests'}]}, {'Retry-After': '1'})
+            return False
+        if srv.down():
+            srv.errors[api] += 1
+            while srv.outage_mode == 'hang' and srv.down():
+                time.sleep(0.1)
+            self._reply(503, {'errors': [{'code': 0, 'message': 'Service unavailable'}]})
+            return False
+        delay = srv.latency + (random.uniform(-srv.jitter, srv.jitter) if srv.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if srv.error_rate and random.random() < srv.error_rate:
+            srv.errors[api] += 1
+            self._reply(500, {'errors': [{'code': 0, 'message': 'InternalServerError'}]})
+            return False
+        return True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self._admit('roblox'):
+            return
+        taken = [un for un in body.get('usernames', []) if _fraction(un.lower()) < self.server.taken_rate]
+        self._reply(200, {'data': [{'requestedUsername': un, 'id': 1, 'name': un} for un in taken]})
+
+    def do_GET(self):
+        if self.path == '/_stats':
+            self._reply(200, self.server.stats())
+            return
+        ip = self.path.partition('q=')[2]
+        if not self._admit('ipapi'):
+            return
+        vpn = _fraction(ip) < self.server.vpn_rate
+        self._reply(200, {'ip': ip, 'is_vpn': vpn, 'is_proxy': False, 'is_tor': False, 'is_relay': False})
+
+    def log_message(self, *args):
+        pass
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='Serve fake Roblox and ipapi.is endpoints.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every answer')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- seconds of uniform noise on latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls answered with 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='requests/sec per API before answering 429 (0 = unlimited)')
+    parser.add_argument('--taken-rate', type=float, default=0.3, help='share of names reported taken')
+    parser.add_argument('--vpn-rate', type=float, default=0.05, help='share of IPs reported as VPNs')
+    parser.add_argument('--outage', metavar='UP:DOWN', default=None,
+                        help='cycle UP seconds of service and DOWN seconds of outage')
+    parser.add_argument('--outage-mode', choices=('error', 'hang'), default='error',
+                        help='during an outage answer 503 at once, or hang until it ends')
+    args = parser.parse_args(argv)
+    outage = tuple(float(x) for x in args.outage.split(':')) if args.outage else None
+    server = FakeUpstream(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, rate_limit=args.rate_limit,
+                          taken_rate=args.taken_rate, vpn_rate=args.vpn_rate,
+                          outage=outage, outage_mode=args.outage_mode)
+    print(f'fake upstream on {server.url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
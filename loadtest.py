@@ -0,0 +1,405 @@
+"""End-to-end load test: the render.yaml gunicorn command against fake upstreams.
+
+    python loadtest.py                                    # 30 s, 32 clients, default mix
+    python loadtest.py --duration 60 --rps 150            # open loop at a fixed arrival rate
+    python loadtest.py --mix-from logs/security-*.log     # replay a production request mix
+    python loadtest.py --latency 0.3 --error-rate 0.05 --rate-limit 20
+    python loadtest.py --workers 4 --threads 8            # try another sizing
+    python loadtest.py --target http://127.0.0.1:5000     # drive a server you started
+    python loadtest.py --async                            # gevent workers (async mode)
+    python loadtest.py --compare --clients 400            # threaded vs async, same workers
+
+Unless --target is given, it starts fakeapi.py and the startCommand from
+render.yaml on a free port, with ROBLOX_API and IPAPI_URL pointed at the
+fake and shared state and logs in a throwaway directory. Clients spread
+their requests over --ips X-Forwarded-For addresses so the per-IP rate
+limit behaves as it would with real traffic.
+
+The report (JSON with --json) has RPS, p50/p95/p99 latency overall and per
+endpoint, status codes, upstream calls, and thread saturation from the
+server's busy_threads histogram: mean busy threads per worker and the share
+of requests that took a worker's last free thread.
+"""
+import argparse
+import ast
+import itertools
+import json
+import os
+import random
+import re
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Endpoint shares of the default mix; /generate parameters follow the UI's
+# defaults, weighted towards Roblox.
+DEFAULT_ENDPOINTS = {'generate': 70, 'check-ip': 15, 'index': 8, 'stream': 5, 'health': 2}
+DEFAULT_PLATFORMS = {'roblox': 50, 'discord': 15, 'tiktok': 10, 'youtube': 10, 'twitch': 8, 'steam': 7}
+DEFAULT_STYLES    = {'unique': 30, 'rank': 15, 'aesthetic': 15, 'leet': 15, 'themed': 15, 'custom': 10}
+DEFAULT_BASES     = ['shadow', 'space', 'nova', 'blaze', 'frost']
+
+_GENERATE_RE = re.compile(r'GENERATE_REQUEST  ip=\S+  platform=(\w+)  style=(\w+)  '
+                          r'length=(\d+)  count=(\d+)  base=(.*)$')
+
+
+# ── Request mix ───────────────────────────────────────────────────────────────
+
+def _weighted(weights: dict):
+    keys, cum = list(weights), list(itertools.accumulate(weights.values()))
+    return lambda rng: rng.choices(keys, cum_weights=cum)[0]
+
+
+def default_mix():
+    endpoint, platform, style = map(_weighted, (DEFAULT_ENDPOINTS, DEFAULT_PLATFORMS, DEFAULT_STYLES))
+
+    def draw(rng: random.Random) -> tuple[str, dict | None]:
+        kind = endpoint(rng)
+        if kind not in ('generate', 'stream'):
+            return kind, None
+        s = style(rng)
+        body = {'platform': platform(rng), 'style': s, 'length': rng.randint(6, 12),
+                'count': rng.choice((10, 10, 10, 20, 50))}
+        if s in ('custom', 'themed') and rng.random() < 0.7:
+            body['base'] = rng.choice(DEFAULT_BASES)
+        return kind, body
+    return draw
+
+
+def _log_events(line: str) -> tuple[str, dict] | None:
+    """(event, fields) from a text or JSON security log line."""
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        return entry.get('event', ''), entry
+    m = _GENERATE_RE.search(line.rstrip('\n'))
+    if m:
+        return 'GENERATE_REQUEST', dict(zip(('platform', 'style', 'length', 'count', 'base'), m.groups()))
+    return ('VISIT', {}) if '  VISIT  ' in line else None
+
+
+def log_mix(paths: list[str]):
+    """Replay the /generate parameters of GENERATE_REQUEST lines in security logs.
+
+    VISIT lines count towards /check-ip so the endpoint split follows the
+    logs too; other endpoints keep their default share.
+    """
+    bodies, visits = [], 0
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for event, fields in filter(None, map(_log_events, f)):
+                if event == 'GENERATE_REQUEST':
+                    body = {'platform': fields['platform'], 'style': fields['style'],
+                            'length': int(fields['length']), 'count': int(fields['count'])}
+                    base = ast.literal_eval(str(fields['base']))
+                    if base:
+                        body['base'] = base
+                    bodies.append(body)
+                elif event == 'VISIT':
+                    visits += 1
+    if not bodies:
+        sys.exit(f'no GENERATE_REQUEST lines in {", ".join(paths)}')
+    rest  = {k: v for k, v in DEFAULT_ENDPOINTS.items() if k not in ('generate', 'check-ip')}
+    share = sum(rest.values()) / 100
+    total = len(bodies) + visits
+    endpoint = _weighted({'generate': len(bodies) / total * (1 - share),
+                          'check-ip': visits / total * (1 - share),
+                          **{k: v / 100 for k, v in rest.items()}})
+
+    def draw(rng: random.Random) -> tuple[str, dict | None]:
+        kind = endpoint(rng)
+        return kind, (rng.choice(bodies) if kind in ('generate', 'stream') else None)
+    print(f'mix from {len(paths)} log(s): {len(bodies)} generate requests, {visits} visits', file=sys.stderr)
+    return draw
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+ROUTES = {
+    'generate': ('POST', '/generate'),
+    'stream':   ('POST', '/generate/stream'),
+    'check-ip': ('GET',  '/check-ip'),
+    'index':    ('GET',  '/'),
+    'health':   ('GET',  '/health'),
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.lock      = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses  = defaultdict(Counter)
+
+    def add(self, kind: str, seconds: float, status) -> None:
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            self.statuses[kind][status] += 1
+
+
+def _client(base_url: str, draw, ips: list[str], deadline: float, rec: Recorder,
+            seed: int, slot: int, clients: int, rps: float | None, t0: float) -> None:
+    """One simulated client: closed loop, or every `clients`-th arrival at `rps`."""
+    rng     = random.Random(seed)
+    session = requests.Session()
+    k       = slot
+    while True:
+        if rps:
+            # Latency counts from the scheduled arrival, so a server that falls
+            # behind is not hidden by clients waiting on it.
+            start = t0 + k / rps
+            k    += clients
+            if start >= deadline:
+                return
+            delay = start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+        kind, body = draw(rng)
+        method, path = ROUTES[kind]
+        headers = {'X-Forwarded-For': rng.choice(ips)}
+        try:
+            resp = session.request(method, base_url + path, json=body, headers=headers, timeout=60)
+            resp.content   # read streamed bodies to the end
+            status = resp.status_code
+        except requests.RequestException as exc:
+            status = type(exc).__name__
+        rec.add(kind, time.perf_counter() - start, status)
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    pick   = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50_ms': round(pick(0.50) * 1e3, 1), 'p95_ms': round(pick(0.95) * 1e3, 1),
+            'p99_ms': round(pick(0.99) * 1e3, 1), 'max_ms': round(values[-1] * 1e3, 1)}
+
+
+# ── Server-side numbers ───────────────────────────────────────────────────────
+
+_SAMPLE_RE = re.compile(r'^(spacegen_\w+?)(?:\{(.*)\})? (\S+)$')
+
+
+def scrape(base_url: str) -> dict:
+    """Parse /metrics into {(name, labels): value}."""
+    try:
+        text = requests.get(base_url + '/metrics', timeout=10).text
+    except requests.RequestException:
+        return {}
+    out = {}
+    for line in text.splitlines():
+        m = _SAMPLE_RE.match(line)
+        if m:
+            out[(m.group(1), m.group(2) or '')] = float(m.group(3))
+    return out
+
+
+def saturation(before: dict, after: dict, threads: int) -> dict:
+    delta = lambda key: after.get(key, 0) - before.get(key, 0)
+    n     = delta(('spacegen_busy_threads_count', ''))
+    if not n:
+        return {}
+    return {
+        'threads_per_worker': threads,
+        'mean_busy_threads':  round(delta(('spacegen_busy_threads_sum', '')) / n, 2),
+        'saturated_share':    round(delta(('spacegen_saturated_requests_total', '')) / n, 3),
+    }
+
+
+# ── Processes ─────────────────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f'{proc.args[0]} exited with {proc.returncode} before serving {url}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    sys.exit(f'{url} did not come up within {timeout:.0f}s')
+
+
+def start_command(workers: int | None, threads: int | None, connections: int | None = None) -> str:
+    """The startCommand from render.yaml, with optional sizing overrides.
+
+    With `connections` the workers are gevent ones (async mode) allowing that
+    many concurrent requests each; --threads is then ignored by gunicorn.
+    """
+    with open(os.path.join(HERE, 'render.yaml'), encoding='utf-8') as f:
+        cmd = next(line.split('startCommand:', 1)[1].strip() for line in f if 'startCommand:' in line)
+    if workers:
+        cmd = re.sub(r'--workers \d+', f'--workers {workers}', cmd)
+    if threads:
+        cmd = re.sub(r'--threads \d+', f'--threads {threads}', cmd)
+    if connections:
+        cmd += f' --worker-class gevent --worker-connections {connections}'
+    return cmd
+
+
+def run(args, cmd: str | None) -> dict:
+    """Start the servers for `cmd` (None: use --target), apply load, report."""
+    procs, base_url, upstream = [], args.target, None
+    m = re.search(r'--worker-connections (\d+)', cmd or '') or re.search(r'--threads (\d+)', cmd or '')
+    threads = int(m.group(1)) if m else 0
+    try:
+        if base_url is None:
+            state = tempfile.mkdtemp(prefix='spacegen-load-')
+            fake_port, port = _free_port(), _free_port()
+            upstream = f'http://127.0.0.1:{fake_port}'
+            procs.append(subprocess.Popen(
+                [sys.executable, os.path.join(HERE, 'fakeapi.py'), '--port', str(fake_port),
+                 '--latency', str(args.latency), '--jitter', str(args.jitter),
+                 '--error-rate', str(args.error_rate), '--rate-limit', str(args.rate_limit)],
+                stdout=subprocess.DEVNULL))
+            _wait_for(upstream + '/_stats', procs[-1])
+            env = {**os.environ,
+                   'PORT':              str(port),
+                   'ROBLOX_API':        upstream + '/v1/usernames/users',
+                   'IPAPI_URL':         upstream + '/',
+                   'WEB_THREADS':       str(threads),
+                   'SHARED_STATE_DIR':  state,
+                   'LOG_DIR':           os.path.join(state, 'logs'),
+                   'DISABLE_VPN_CHECK': '0'}
+            log = open(os.path.join(state, 'gunicorn.log'), 'w')
+            procs.append(subprocess.Popen(shlex.split(cmd.replace('$PORT', str(port))),
+                                          cwd=HERE, env=env, stdout=log, stderr=log))
+            base_url = f'http://127.0.0.1:{port}'
+            _wait_for(base_url + '/health', procs[-1])
+            print(f'{cmd}  (logs in {state})', file=sys.stderr)
+
+        draw = log_mix(args.mix_from) if args.mix_from else default_mix()
+        rng  = random.Random(args.seed)
+        ips  = [f'{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}'
+                for _ in range(args.ips)]
+        rec  = Recorder()
+
+        before   = scrape(base_url)
+        t0       = time.perf_counter()
+        deadline = t0 + args.duration
+        clients  = [threading.Thread(target=_client, daemon=True,
+                                     args=(base_url, draw, ips, deadline, rec, args.seed + i, i,
+                                           args.clients, args.rps, t0))
+                    for i in range(args.clients)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        elapsed = time.perf_counter() - t0
+        time.sleep(2.5)   # let every worker flush its metrics (METRICS_FLUSH)
+        after = scrape(base_url)
+
+        every = [s for lat in rec.latencies.values() for s in lat]
+        report = {
+            'command':     cmd or args.target,
+            'duration_s':  round(elapsed, 1),
+            'clients':     args.clients,
+            'offered_rps': args.rps,
+            'requests':    len(every),
+            'rps':         round(len(every) / elapsed, 1),
+            'latency':     _percentiles(every),
+            'endpoints':   {kind: {'requests': len(lat), 'statuses': dict(rec.statuses[kind]),
+                                   **_percentiles(lat)}
+                            for kind, lat in sorted(rec.latencies.items())},
+            'saturation':  saturation(before, after, threads) if threads else {},
+        }
+        if upstream:
+            report['upstream'] = requests.get(upstream + '/_stats', timeout=5).json()
+        return report
+    finally:
+        for proc in reversed(procs):
+            proc.send_signal(signal.SIGTERM)
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _print(report: dict) -> None:
+    lat, sat = report['latency'], report['saturation']
+    print(report['command'])
+    print(f"{report['requests']} requests in {report['duration_s']}s = {report['rps']} req/s   "
+          f"p50 {lat.get('p50_ms')} ms  p95 {lat.get('p95_ms')} ms  p99 {lat.get('p99_ms')} ms")
+    for kind, e in report['endpoints'].items():
+        statuses = ' '.join(f'{k}:{v}' for k, v in sorted(e['statuses'].items(), key=str))
+        print(f"  {kind:<9} {e['requests']:>7}  p50 {e['p50_ms']:>8}  p95 {e['p95_ms']:>8}  "
+              f"p99 {e['p99_ms']:>8}  [{statuses}]")
+    if sat:
+        print(f"  threads   {sat['mean_busy_threads']}/{sat['threads_per_worker']} busy on average, "
+              f"{sat['saturated_share']:.1%} of requests took a worker's last free thread")
+    if 'upstream' in report:
+        print(f"  upstream  {json.dumps(report['upstream'])}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load (default 30)')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent clients (default 32)')
+    parser.add_argument('--rps', type=float, help='open loop: total arrivals per second')
+    parser.add_argument('--ips', type=int, default=5000, help='distinct client IPs (default 5000)')
+    parser.add_argument('--mix-from', metavar='SECURITY_LOG', nargs='+',
+                        help='derive the request mix from security logs')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--target', help='drive this server instead of starting one')
+    parser.add_argument('--workers', type=int, help='override --workers from render.yaml')
+    parser.add_argument('--threads', type=int, help='override --threads from render.yaml')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='serve with gevent workers (async mode)')
+    parser.add_argument('--connections', type=int, default=1000,
+                        help='concurrent requests per async worker (default 1000)')
+    parser.add_argument('--compare', action='store_true',
+                        help='run threaded and async mode at equal worker counts')
+    parser.add_argument('--latency', type=float, default=0.15, help='fake upstream latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='fake upstream jitter (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fake upstream 500 share')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='fake upstream req/s before 429')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    if args.compare and args.target:
+        parser.error('--compare starts its own servers; drop --target')
+
+    if args.target:
+        cmds = [None]
+    elif args.compare:
+        cmds = [start_command(args.workers, args.threads),
+                start_command(args.workers, args.threads, args.connections)]
+    else:
+        cmds = [start_command(args.workers, args.threads, args.connections if args.use_async else None)]
+    reports = [run(args, cmd) for cmd in cmds]
+
+    if args.json:
+        print(json.dumps(reports if args.compare else reports[0], indent=2))
+        return 0
+    for report in reports:
+        _print(report)
+    if args.compare:
+        threaded, async_ = reports
+        print(f"async vs threaded: {async_['rps'] / max(threaded['rps'], 1e-9):.2f}x req/s, "
+              f"p99 {async_['latency'].get('p99_ms')} vs {threaded['latency'].get('p99_ms')} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
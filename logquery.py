@@ -0,0 +1,362 @@
+"""Indexed queries over the security logs, rotations and per-worker files included.
+
+    python logquery.py top-ips --event RATE_LIMITED --since 1h
+    python logquery.py mix --since 24h --by platform/style
+    python logquery.py events --since 30m
+    python logquery.py ip 203.0.113.9 --since 7d
+    python logquery.py top-ips --event VPN_DETECTED --follow 10   # re-query every 10 s
+
+Every query first brings the index up to date and then answers from it.
+The index lives in LOG_DIR/.logindex: one segment per log file, keyed by
+device and inode so a rotation (a rename) keeps its segment, plus a shared
+string table of IPs and keys. Files are read through mmap from where the
+last run stopped, in one pass, up to the last complete line, so a run only
+parses what was written since the previous one; a file that shrank or
+whose first line changed is indexed again from the start. Segments of files
+that rotated away are dropped.
+
+A segment holds, for each event type, three uint32 columns in time order:
+the Unix time, the IP's string id and a key's string id. The key is the
+field(s) a query groups by, e.g. "roblox/rank" for GENERATE_REQUEST
+(see KEY_FIELDS). A time window is then a bisect per segment and the counts
+are Counter() over column slices.
+
+Both LOG_FORMAT=text and LOG_FORMAT=json lines are understood.
+"""
+import argparse
+import calendar
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+KEY_FIELDS = {
+    'GENERATE_REQUEST':  ('platform', 'style'),
+    'GENERATE_RESULT':   ('platform',),
+    'INVALID_INPUT':     ('field', 'reason'),
+    'SUSPICIOUS_INPUT':  ('field',),
+    'VPN_DETECTED':      ('flags',),
+    'VISIT':             ('vpn',),
+    'JOB_SUBMITTED':     ('platform', 'style'),
+    'BREAKER':           ('upstream', 'state'),
+    'VPN_CHECK_ERROR':   (),
+}
+_HEADER = struct.Struct('<I')   # length of the JSON header that follows
+_UNITS  = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_EVENT  = re.compile(r'[A-Z][A-Z_]+')
+
+
+def _fields(message: str) -> tuple[str, dict]:
+    """(event, fields) of an ``EVENT  key=value  key=value`` message."""
+    head, *parts = message.split('  ')
+    fields, key = {}, None
+    for part in parts:
+        k, eq, v = part.partition('=')
+        if eq and k.isidentifier():
+            key, fields[k] = k, v
+        elif key:   # a value that itself contained two spaces
+            fields[key] = f'{fields[key]}  {part}'
+    return head, fields
+
+
+class _Clock:
+    """Timestamp text to Unix time, cached per second (most lines share one)."""
+
+    def __init__(self):
+        self.text, self.value = '', 0
+
+    def local(self, text: str) -> int:   # text format: '%Y-%m-%d %H:%M:%S' local time
+        if text != self.text:
+            self.text, self.value = text, int(time.mktime(time.strptime(text, '%Y-%m-%d %H:%M:%S')))
+        return self.value
+
+    def utc(self, text: str) -> int:     # json format: '%Y-%m-%dT%H:%M:%S.mmmZ'
+        text = text[:19]
+        if text != self.text:
+            self.text, self.value = text, calendar.timegm(time.strptime(text, '%Y-%m-%dT%H:%M:%S'))
+        return self.value
+
+
+def parse_line(line: str, clock: _Clock) -> tuple[int, str, dict] | None:
+    """(unix time, event, fields) of a text or JSON security log line."""
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            return clock.utc(entry['ts']), entry['event'], entry
+        except (ValueError, KeyError, TypeError):
+            return None
+    at = line.find('  security  ', 19)
+    if at < 0:
+        return None
+    event, fields = _fields(line[at + 12:].rstrip('\r\n'))
+    if not _EVENT.fullmatch(event):
+        return None
+    try:
+        return clock.local(line[:19]), event, fields
+    except ValueError:
+        return None
+
+
+class Index:
+    def __init__(self, log_dir: str, index_dir: str | None = None):
+        self.log_dir   = log_dir
+        self.index_dir = index_dir or os.path.join(log_dir, '.logindex')
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._strings_path = os.path.join(self.index_dir, 'strings.txt')
+        self.strings: list[str] = []
+        if os.path.exists(self._strings_path):
+            with open(self._strings_path, encoding='utf-8') as f:
+                self.strings = f.read().split('\n')[:-1]
+        self._ids     = {s: i for i, s in enumerate(self.strings)}
+        self._new     = []
+        self.segments: dict[str, tuple[dict, dict]] = {}   # name -> (header, {event: columns})
+
+    # ── Building ──────────────────────────────────────────────────────────────
+
+    def _id(self, text: str) -> int:
+        i = self._ids.get(text)
+        if i is None:
+            i = self._ids[text] = len(self.strings)
+            self.strings.append(text)
+            self._new.append(text)
+        return i
+
+    def _flush_strings(self) -> None:
+        if self._new:
+            with open(self._strings_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(s.replace('\n', ' ') + '\n' for s in self._new))
+            self._new = []
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.index_dir, f'{name}.seg')
+
+    def _load_segment(self, name: str) -> tuple[dict, dict] | None:
+        try:
+            with open(self._segment_path(name), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        (n,)   = _HEADER.unpack_from(data)
+        header = json.loads(data[_HEADER.size:_HEADER.size + n])
+        at, columns = _HEADER.size + n, {}
+        for event, count in header['events'].items():
+            cols = []
+            for _ in range(3):
+                col = array('I')
+                col.frombytes(data[at:at + 4 * count])
+                cols.append(col)
+                at += 4 * count
+            columns[event] = cols
+        return header, columns
+
+    def _save_segment(self, name: str, header: dict, columns: dict) -> None:
+        header['events'] = {event: len(cols[0]) for event, cols in columns.items()}
+        head = json.dumps(header).encode()
+        tmp  = self._segment_path(name) + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(len(head)))
+            f.write(head)
+            for cols in columns.values():
+                for col in cols:
+                    f.write(col.tobytes())
+        os.replace(tmp, self._segment_path(name))
+
+    def _scan(self, path: str, start: int, columns: dict) -> int:
+        """Index complete lines from byte `start`; return the new offset."""
+        clock = _Clock()
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= start:
+                return start
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                end = mm.rfind(b'\n', start, size) + 1
+                if end <= start:
+                    return start
+                mm.seek(start)
+                while mm.tell() < end:
+                    parsed = parse_line(mm.readline().decode('utf-8', 'replace'), clock)
+                    if parsed is None:
+                        continue
+                    ts, event, fields = parsed
+                    key  = '/'.join(str(fields.get(k, '')) for k in KEY_FIELDS.get(event, ())
+                                    if k in fields)
+                    cols = columns.setdefault(event, (array('I'), array('I'), array('I')))
+                    cols[0].append(ts)
+                    cols[1].append(self._id(str(fields.get('ip', ''))))
+                    cols[2].append(self._id(key))
+        return end
+
+    def update(self) -> dict:
+        """Index whatever the log files gained since the last update."""
+        t0, lines_before = time.perf_counter(), len(self.strings)
+        live, scanned = set(), 0
+        for path in sorted(glob.glob(os.path.join(self.log_dir, 'security*.log*'))):
+            try:
+                st = os.stat(path)
+                with open(path, 'rb') as f:
+                    first = f.read(64).hex()
+            except OSError:
+                continue   # rotated away between glob and open
+            name = f'{st.st_dev}-{st.st_ino}'
+            live.add(name)
+            loaded = self._load_segment(name)
+            header, columns = loaded if loaded else ({'offset': 0}, {})
+            if not first.startswith(header.get('first', '')) or st.st_size < header['offset']:
+                header, columns = {'offset': 0}, {}   # inode reused: a different file
+            if st.st_size == header['offset'] and loaded:
+                self.segments[name] = (header, columns)
+                continue
+            before = header['offset']
+            header['offset'] = self._scan(path, before, columns)
+            header['first']  = first
+            header['path']   = os.path.basename(path)
+            scanned += header['offset'] - before
+            for cols in columns.values():
+                if any(a > b for a, b in zip(cols[0], cols[0][1:])):   # writer threads can interleave
+                    order = sorted(range(len(cols[0])), key=cols[0].__getitem__)
+                    for i, col in enumerate(cols):
+                        cols[i][:] = array('I', (col[j] for j in order))
+            self._flush_strings()   # before any segment refers to them
+            self._save_segment(name, header, columns)
+            self.segments[name] = (header, columns)
+        for stale in set(self.segments) - live:
+            del self.segments[stale]
+        for path in glob.glob(os.path.join(self.index_dir, '*.seg')):
+            if os.path.basename(path)[:-4] not in live:
+                os.remove(path)
+        return {'files': len(live), 'bytes_scanned': scanned, 'new_strings': len(self.strings) - lines_before,
+                'ms': round((time.perf_counter() - t0) * 1e3, 1)}
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+
+    def _slices(self, event: str | None, since: int):
+        for _, columns in self.segments.values():
+            for ev, (ts, ips, keys) in columns.items():
+                if event is None or ev == event:
+                    lo = bisect_left(ts, since)
+                    yield ev, ips[lo:], keys[lo:]
+
+    def events(self, since: int = 0) -> Counter:
+        counts = Counter()
+        for ev, ips, _ in self._slices(None, since):
+            counts[ev] += len(ips)
+        return counts
+
+    def top_ips(self, event: str, since: int = 0) -> Counter:
+        counts = Counter()
+        for _, ips, _ in self._slices(event, since):
+            counts.update(ips)
+        return Counter({self.strings[i]: n for i, n in counts.items() if self.strings[i]})
+
+    def keys(self, event: str, since: int = 0) -> Counter:
+        counts = Counter()
+        for _, _, keys in self._slices(event, since):
+            counts.update(keys)
+        return Counter({self.strings[i]: n for i, n in counts.items()})
+
+    def ip(self, address: str, since: int = 0) -> Counter:
+        target, counts = self._ids.get(address), Counter()
+        if target is None:
+            return counts
+        for ev, ips, _ in self._slices(None, since):
+            n = ips.count(target)
+            if n:
+                counts[ev] += n
+        return counts
+
+
+def _since(text: str | None) -> int:
+    """'90s', '30m', '1h', '7d' back from now, or an ISO date/time; None = all."""
+    if not text:
+        return 0
+    if text[-1] in _UNITS and text[:-1].isdigit():
+        return int(time.time()) - int(text[:-1]) * _UNITS[text[-1]]
+    for fmt in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return int(time.mktime(time.strptime(text, fmt)))
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f'bad --since: {text!r}')
+
+
+def _mix(index: Index, since: int, by: str) -> Counter:
+    wanted = by.split('/')
+    counts = Counter()
+    for key, n in index.keys('GENERATE_REQUEST', since).items():
+        parts = dict(zip(KEY_FIELDS['GENERATE_REQUEST'], key.split('/')))
+        counts['/'.join(parts.get(w, '?') for w in wanted)] += n
+    return counts
+
+
+def query(index: Index, args) -> dict:
+    since = _since(args.since)
+    if args.command == 'events':
+        rows = index.events(since)
+    elif args.command == 'top-ips':
+        rows = index.top_ips(args.event, since)
+    elif args.command == 'mix':
+        rows = _mix(index, since, args.by)
+    elif args.command == 'keys':
+        rows = index.keys(args.event, since)
+    else:
+        rows = index.ip(args.address, since)
+    return {'query': args.command, 'since': since, 'rows': rows.most_common(args.limit)}
+
+
+def _print(result: dict, stats: dict, ms: float) -> None:
+    rows = result['rows']
+    width = max((len(str(k)) for k, _ in rows), default=0)
+    for key, n in rows:
+        print(f'{str(key):<{width}}  {n}')
+    if not rows:
+        print('(no matching events)')
+    print(f'-- indexed {stats["bytes_scanned"]} new bytes from {stats["files"]} files in {stats["ms"]} ms, '
+          f'query {ms:.1f} ms', file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dir', default=os.environ.get('LOG_DIR', 'logs'), help='log directory (LOG_DIR)')
+    common.add_argument('--index', help='index directory (default DIR/.logindex)')
+    common.add_argument('--since', help="window start: '30m', '1h', '7d' or a date/time")
+    common.add_argument('--limit', type=int, default=20)
+    common.add_argument('--json', action='store_true', help='print the result as JSON')
+    common.add_argument('--follow', type=float, metavar='SECONDS', help='update and re-query every SECONDS')
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    sub    = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('events', parents=[common], help='event counts')
+    p = sub.add_parser('top-ips', parents=[common], help='IPs with the most events of one type')
+    p.add_argument('--event', default='RATE_LIMITED')
+    p = sub.add_parser('mix', parents=[common], help='GENERATE_REQUEST counts by platform and/or style')
+    p.add_argument('--by', default='platform/style',
+                   choices=('platform', 'style', 'platform/style', 'style/platform'))
+    p = sub.add_parser('keys', parents=[common], help="counts of an event's key fields (see KEY_FIELDS)")
+    p.add_argument('--event', default='GENERATE_REQUEST')
+    p = sub.add_parser('ip', parents=[common], help='event counts for one IP')
+    p.add_argument('address')
+    args = parser.parse_args(argv)
+
+    index = Index(args.dir, args.index)
+    while True:
+        stats = index.update()
+        t0     = time.perf_counter()
+        result = query(index, args)
+        ms     = (time.perf_counter() - t0) * 1e3
+        if args.json:
+            print(json.dumps({**result, 'index': stats, 'query_ms': round(ms, 2)}), flush=True)
+        else:
+            _print(result, stats, ms)
+        if not args.follow:
+            return 0
+        time.sleep(args.follow)
+
+
+if __name__ == '__main__':
+    sys.exit(main())